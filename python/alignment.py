@@ -0,0 +1,174 @@
+"""Sequence alignment of expected vs. recognized kana.
+
+Two modes return the same alignment tuples
+``(orig_idx, trans_idx, orig_symbol, trans_symbol, is_match)``:
+
+``lcs``
+    Longest common subsequence computed bit-parallel (Hyyrö): one row of the
+    DP table is a Python integer bit vector, so a row costs a handful of
+    big-integer operations instead of ``n`` Python steps. Backtracking reads
+    table values back from the stored row vectors and yields exactly the
+    alignment of the classic table-based LCS (matches, deletions, insertions).
+
+``weighted``
+    Edit distance with phonetic substitution costs, one NumPy-vectorized row at
+    a time. Similar sounds (voicing pairs, known learner confusions) are cheap
+    substitutions, so it also reports substitutions instead of a deletion plus
+    an insertion.
+"""
+import unicodedata
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+AlignmentStep = Tuple[Optional[int], Optional[int], Optional[str], Optional[str], bool]
+
+ALIGNMENT_MODES = ("lcs", "weighted")
+
+# Cặp âm dễ nhầm lẫn với người học (chi phí thay thế thấp)
+CONFUSABLE_PAIRS = frozenset(frozenset(pair) for pair in (
+    ("し", "す"), ("つ", "す"), ("ふ", "は"), ("お", "を"), ("へ", "え"),
+    ("ち", "つ"), ("じ", "ず"), ("ぢ", "じ"), ("づ", "ず"), ("ん", "む"),
+    ("ら", "だ"), ("り", "ぢ"), ("る", "づ"), ("れ", "で"), ("ろ", "ど"),
+))
+SIMILAR_SUBSTITUTION_COST = 0.5
+_EPSILON = 1e-9
+
+try:
+    _popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def _popcount(value: int) -> int:
+        return bin(value).count("1")
+
+
+def _base_kana(symbol: str) -> str:
+    """Strip voicing marks (か/が/ぱ -> か/か/は) via canonical decomposition."""
+    return ''.join(ch for ch in unicodedata.normalize("NFD", symbol) if ch not in "\u3099\u309a")
+
+
+@lru_cache(maxsize=65536)
+def phonetic_substitution_cost(expected: str, actual: str) -> float:
+    """0 for identical symbols, 0.5 for voicing pairs and common confusions, 1 otherwise."""
+    if expected == actual:
+        return 0.0
+    if frozenset((expected, actual)) in CONFUSABLE_PAIRS:
+        return SIMILAR_SUBSTITUTION_COST
+    if _base_kana(expected) == _base_kana(actual):
+        return SIMILAR_SUBSTITUTION_COST
+    return 1.0
+
+
+def lcs_rows(a: Sequence[str], b: Sequence[str]) -> List[int]:
+    """Bit-parallel LCS rows: bit ``j`` of row ``i`` is 0 where ``L[i][j+1] > L[i][j]``."""
+    n = len(b)
+    mask = (1 << n) - 1
+    match_masks: Dict[str, int] = {}
+    for j, symbol in enumerate(b):
+        match_masks[symbol] = match_masks.get(symbol, 0) | (1 << j)
+
+    row = mask
+    rows = [row]
+    for symbol in a:
+        matches = row & match_masks.get(symbol, 0)
+        row = ((row + matches) | (row - matches)) & mask
+        rows.append(row)
+    return rows
+
+
+def lcs_length(a: Sequence[str], b: Sequence[str]) -> int:
+    return len(b) - _popcount(lcs_rows(a, b)[-1])
+
+
+def align_lcs(a: Sequence[str], b: Sequence[str]) -> List[AlignmentStep]:
+    """LCS alignment identical to the classic ``(m+1)×(n+1)`` table backtrack."""
+    rows = lcs_rows(a, b)
+
+    def table(i: int, j: int) -> int:
+        return j - _popcount(rows[i] & ((1 << j) - 1))
+
+    i, j = len(a), len(b)
+    alignment: List[AlignmentStep] = []
+    while i > 0 and j > 0:
+        if a[i-1] == b[j-1]:
+            alignment.append((i-1, j-1, a[i-1], b[j-1], True))  # Match
+            i -= 1
+            j -= 1
+        elif table(i-1, j) >= table(i, j-1):
+            alignment.append((i-1, None, a[i-1], None, False))  # Deletion
+            i -= 1
+        else:
+            alignment.append((None, j-1, None, b[j-1], False))  # Insertion
+            j -= 1
+    while i > 0:
+        alignment.append((i-1, None, a[i-1], None, False))
+        i -= 1
+    while j > 0:
+        alignment.append((None, j-1, None, b[j-1], False))
+        j -= 1
+    alignment.reverse()
+    return alignment
+
+
+def edit_distance_table(a: Sequence[str], b: Sequence[str],
+                        substitution_cost: Callable[[str, str], float] = phonetic_substitution_cost,
+                        insertion_cost: float = 1.0, deletion_cost: float = 1.0) -> np.ndarray:
+    """Weighted Levenshtein DP table, filled one vectorized row at a time."""
+    m, n = len(a), len(b)
+    symbols_a = sorted(set(a))
+    symbols_b = sorted(set(b))
+    index_b = {symbol: k for k, symbol in enumerate(symbols_b)}
+    codes_b = np.fromiter((index_b[symbol] for symbol in b), dtype=np.intp, count=n)
+    costs = {
+        symbol: np.array([substitution_cost(symbol, other) for other in symbols_b], dtype=np.float64)[codes_b]
+        for symbol in symbols_a
+    }
+
+    steps = np.arange(n + 1, dtype=np.float64) * insertion_cost
+    table = np.empty((m + 1, n + 1), dtype=np.float64)
+    table[0] = steps
+    for i in range(1, m + 1):
+        prev = table[i-1]
+        best = np.minimum(prev[:-1] + costs[a[i-1]], prev[1:] + deletion_cost)
+        # Insertions chain along the row: row[j] = min_k<=j (best[k] + (j-k) * insertion_cost)
+        row = np.concatenate(([prev[0] + deletion_cost], best))
+        table[i] = np.minimum.accumulate(row - steps) + steps
+    return table
+
+
+def align_weighted(a: Sequence[str], b: Sequence[str],
+                   substitution_cost: Callable[[str, str], float] = phonetic_substitution_cost,
+                   insertion_cost: float = 1.0, deletion_cost: float = 1.0) -> List[AlignmentStep]:
+    """Minimum-cost alignment; mismatched diagonal steps are reported as substitutions."""
+    table = edit_distance_table(a, b, substitution_cost, insertion_cost, deletion_cost)
+    i, j = len(a), len(b)
+    alignment: List[AlignmentStep] = []
+    while i > 0 and j > 0:
+        current = table.item(i, j)
+        if abs(current - table.item(i-1, j-1) - substitution_cost(a[i-1], b[j-1])) <= _EPSILON:
+            alignment.append((i-1, j-1, a[i-1], b[j-1], a[i-1] == b[j-1]))
+            i -= 1
+            j -= 1
+        elif abs(current - table.item(i-1, j) - deletion_cost) <= _EPSILON:
+            alignment.append((i-1, None, a[i-1], None, False))
+            i -= 1
+        else:
+            alignment.append((None, j-1, None, b[j-1], False))
+            j -= 1
+    while i > 0:
+        alignment.append((i-1, None, a[i-1], None, False))
+        i -= 1
+    while j > 0:
+        alignment.append((None, j-1, None, b[j-1], False))
+        j -= 1
+    alignment.reverse()
+    return alignment
+
+
+def align(a: Sequence[str], b: Sequence[str], mode: str = "lcs") -> List[AlignmentStep]:
+    """Align ``a`` (expected) against ``b`` (recognized) with the given mode."""
+    if mode == "lcs":
+        return align_lcs(a, b)
+    if mode == "weighted":
+        return align_weighted(a, b)
+    raise ValueError(f"Unknown alignment mode '{mode}', expected one of: {', '.join(ALIGNMENT_MODES)}")
@@ -0,0 +1,215 @@
+"""Speech recognition backends: OpenAI Whisper API or a local CPU Whisper model.
+
+Every backend takes decoded mono float32 PCM and returns the recognized text,
+so callers (and the transcription cache) do not care where ASR runs.
+"""
+import abc
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from audio_io import TARGET_SR, encode_wav
+from openai_client import AsyncOpenAIPool
+
+logger = logging.getLogger(__name__)
+
+ASR_BACKENDS = ("openai", "local")
+
+
+class ASRBackend(abc.ABC):
+    """Interface implemented by every speech recognition backend."""
+
+    name = "asr"
+
+    async def start(self) -> None:
+        """Load models or open connections; called once at application startup."""
+
+    @abc.abstractmethod
+    async def transcribe(self, y: np.ndarray, sr: int, language: str = "ja") -> str:
+        """Recognize mono float32 PCM at ``sr`` Hz."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+    async def aclose(self) -> None:
+        """Release resources; called at application shutdown."""
+
+
+class OpenAIWhisperBackend(ASRBackend):
+    """Hosted Whisper through the shared OpenAI connection pool."""
+
+    def __init__(self, pool: AsyncOpenAIPool, model: str = "whisper-1"):
+        self.pool = pool
+        self.model = model
+        self.name = f"openai:{model}"
+
+    async def transcribe(self, y: np.ndarray, sr: int, language: str = "ja") -> str:
+        return await self.pool.transcribe(("speech.wav", encode_wav(y, sr)), language=language, model=self.model)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "in_flight": self.pool.stats().get("in_flight")}
+
+
+class LocalWhisperBackend(ASRBackend):
+    """CTranslate2 Whisper (``faster-whisper``) on CPU with dynamic micro-batching.
+
+    Requests arriving within ``max_batch_wait`` seconds of each other (up to
+    ``max_batch_size``) are encoded and decoded as one batch: one encoder pass
+    over the stacked log-Mel features and a batched greedy/beam search. While a
+    batch is running, new requests accumulate for the next one. Clips longer
+    than the 30 s Whisper window are transcribed on their own.
+    """
+
+    def __init__(self, model_size: str = "small", compute_type: str = "int8",
+                 cpu_threads: int = 0, beam_size: int = 1, max_batch_size: int = 8,
+                 max_batch_wait: float = 0.02, timeout: float = 60.0,
+                 download_root: Optional[str] = None):
+        self.model_size = model_size
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+        self.beam_size = max(1, beam_size)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_wait = max(0.0, max_batch_wait)
+        self.timeout = timeout
+        self.download_root = download_root
+        self.name = f"local:{model_size}:{compute_type}"
+        self._model = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # One inference thread: CTranslate2 already parallelizes a batch across cpu_threads
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="asr")
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self) -> None:
+        if self._model is None:
+            self._model = await asyncio.get_running_loop().run_in_executor(self._executor, self._load_model)
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._batch_loop())
+
+    def _load_model(self):
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError("ASR_BACKEND=local requires the faster-whisper package (pip install faster-whisper)")
+        logger.info(f"Loading local Whisper model '{self.model_size}' ({self.compute_type}, cpu_threads={self.cpu_threads})")
+        return WhisperModel(self.model_size, device="cpu", compute_type=self.compute_type,
+                            cpu_threads=self.cpu_threads, download_root=self.download_root)
+
+    async def transcribe(self, y: np.ndarray, sr: int, language: str = "ja") -> str:
+        if sr != TARGET_SR:
+            raise ValueError(f"Local Whisper expects {TARGET_SR} Hz audio, got {sr} Hz")
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((np.asarray(y, dtype=np.float32), language, future))
+        self.requests += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Local Whisper did not answer within {self.timeout}s")
+
+    async def _next_batch(self) -> List[Tuple[np.ndarray, str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_batch_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            by_language: Dict[str, List[Tuple[np.ndarray, asyncio.Future]]] = {}
+            for audio, language, future in batch:
+                if not future.done():
+                    by_language.setdefault(language, []).append((audio, future))
+
+            for language, items in by_language.items():
+                self.batches += 1
+                try:
+                    texts = await loop.run_in_executor(
+                        self._executor, self._transcribe_batch, [audio for audio, _ in items], language
+                    )
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Local Whisper batch of {len(items)} failed: {str(e)}")
+                    for _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+                            future.exception()
+                    continue
+                for (_, future), text in zip(items, texts):
+                    if not future.done():
+                        future.set_result(text)
+
+    def _transcribe_batch(self, audios: List[np.ndarray], language: str) -> List[str]:
+        from faster_whisper.audio import pad_or_trim
+        from faster_whisper.tokenizer import Tokenizer
+        from faster_whisper.transcribe import get_suppressed_tokens
+
+        model = self._model
+        texts: List[Optional[str]] = [None] * len(audios)
+        window = model.feature_extractor.n_samples
+        short = [i for i, audio in enumerate(audios) if len(audio) <= window]
+
+        if short:
+            tokenizer = Tokenizer(model.hf_tokenizer, model.model.is_multilingual,
+                                  task="transcribe", language=language)
+            prompt = model.get_prompt(tokenizer, [], without_timestamps=True)
+            features = np.stack([pad_or_trim(model.feature_extractor(audios[i])[..., :-1]) for i in short])
+            results = model.model.generate(
+                model.encode(features),
+                [list(prompt) for _ in short],
+                beam_size=self.beam_size,
+                max_length=model.max_length,
+                suppress_blank=True,
+                suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+            )
+            for i, result in zip(short, results):
+                texts[i] = tokenizer.decode(result.sequences_ids[0]).strip()
+
+        for i, audio in enumerate(audios):
+            if texts[i] is None:
+                segments, _ = model.transcribe(audio, language=language, beam_size=self.beam_size)
+                texts[i] = "".join(segment.text for segment in segments).strip()
+        return texts
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "loaded": self._model is not None,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "max_batch_size": self.max_batch_size,
+            "max_batch_wait": self.max_batch_wait,
+        }
+
+    async def aclose(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
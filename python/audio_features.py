@@ -0,0 +1,95 @@
+"""CPU-heavy DSP stages used by the speech analysis service.
+
+Every function here is synchronous, takes plain NumPy arrays and returns
+picklable values so it can be dispatched to the DSP process pool.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+import parselmouth
+from parselmouth.praat import call
+
+from pitch_trackers import DEFAULT_TRACKER, track_pitch
+
+
+def warmup() -> bool:
+    """No-op task used to spawn pool workers and import the DSP libraries early."""
+    return True
+
+
+def pitch_track(y: np.ndarray, sr: int, tracker: str = DEFAULT_TRACKER) -> Tuple[np.ndarray, np.ndarray]:
+    """Full F0 track (NaN when unvoiced) and voiced mask from the selected pitch tracker."""
+    _, f0, voiced = track_pitch(y, sr, tracker)
+    return f0, voiced
+
+
+def pitch_contour(y: np.ndarray, sr: int, tracker: str = DEFAULT_TRACKER) -> Optional[np.ndarray]:
+    """Voiced F0 values (Hz) from the selected pitch tracker, or None if nothing is voiced."""
+    if len(y) == 0:
+        return None
+    f0, voiced = pitch_track(y, sr, tracker)
+    if not np.any(voiced):
+        return None
+    return f0[voiced]
+
+
+def formant_tracks(y: np.ndarray, sr: int, n_formants: int = 3) -> Dict[str, np.ndarray]:
+    """F1..Fn tracks (Hz, NaN where undefined) of one Burg analysis plus frame times.
+
+    Each track is copied out of Praat in a single "To Matrix" call instead of
+    one ``get_value_at_time`` call per frame; Praat stores undefined values as 0.
+    """
+    snd = parselmouth.Sound(np.asarray(y, dtype=np.float64), sr)
+    formants = snd.to_formant_burg()
+    tracks = {"times": np.asarray(formants.xs())}
+    for n in range(1, n_formants + 1):
+        values = np.array(call(formants, "To Matrix", n).values[0], dtype=np.float64)
+        values[values <= 0] = np.nan
+        tracks[f"f{n}"] = values
+    return tracks
+
+
+def defined_values(track: np.ndarray) -> np.ndarray:
+    return track[~np.isnan(track)]
+
+
+def f1_values(y: np.ndarray, sr: int) -> List[float]:
+    """Defined F1 values (Hz) of the Burg formant track."""
+    return defined_values(formant_tracks(y, sr, n_formants=1)["f1"]).tolist()
+
+
+def sample_features(y: np.ndarray, sr: int, tracker: str = DEFAULT_TRACKER) -> Dict[str, Any]:
+    """Everything the comparison scoring needs from a reference recording."""
+    y = np.asarray(y, dtype=np.float32)
+    f0, voiced = pitch_track(y, sr, tracker)
+    pitch_contour = f0[voiced]
+    tracks = formant_tracks(y, sr, n_formants=2)
+    f1 = defined_values(tracks["f1"])
+    f2 = defined_values(tracks["f2"])
+    has_pitch = len(pitch_contour) > 0
+    return {
+        "waveform": y,
+        "sr": sr,
+        "tracker": tracker,
+        "f0": f0,
+        "voiced": voiced,
+        "pitch_contour": pitch_contour,
+        "f1_values": f1,
+        "f2_values": f2,
+        "stats": {
+            "pitch_mean": float(np.mean(pitch_contour)) if has_pitch else 0.0,
+            "pitch_std": float(np.std(pitch_contour)) if has_pitch else 0.0,
+            "pitch_range": float(np.ptp(pitch_contour)) if has_pitch else 0.0,
+            "f1_mean": float(np.mean(f1)) if len(f1) > 0 else None,
+            "f2_mean": float(np.mean(f2)) if len(f2) > 0 else None,
+            "rms": float(np.sqrt(np.mean(y ** 2))) if len(y) > 0 else 0.0,
+            "duration": len(y) / sr,
+        },
+    }
+
+
+def load_sample_features(path: str, sr: int, tracker: str = DEFAULT_TRACKER) -> Dict[str, Any]:
+    """Load a reference recording from disk and extract its features."""
+    y, _ = librosa.load(path, sr=sr)
+    return sample_features(y, sr, tracker)
@@ -0,0 +1,245 @@
+"""In-memory audio decoding and encoding (no temporary files)."""
+import asyncio
+import io
+import logging
+from typing import Any, Dict, Optional, Sequence
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+TARGET_SR = 16000
+
+
+class AudioDecodeError(ValueError):
+    """Raised when uploaded bytes cannot be decoded as audio."""
+
+
+class TranscoderBusyError(RuntimeError):
+    """Raised when the ffmpeg transcoder already has the maximum number of jobs waiting."""
+
+
+def _to_mono(y: np.ndarray) -> np.ndarray:
+    return y.mean(axis=1) if y.ndim == 2 else y
+
+
+def decode_with_soundfile(data: bytes, sr: int = TARGET_SR) -> np.ndarray:
+    """Decode WAV/FLAC/OGG (anything libsndfile reads) from memory, resampled to ``sr``."""
+    y, file_sr = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    y = _to_mono(y)
+    if file_sr != sr:
+        y = librosa.resample(y, orig_sr=file_sr, target_sr=sr)
+    return np.ascontiguousarray(y, dtype=np.float32)
+
+
+def ffmpeg_command(sr: int = TARGET_SR, input_args: Sequence[str] = ()) -> list:
+    """ffmpeg invocation reading any container on stdin and writing mono float32 PCM to stdout.
+
+    ``input_args`` describe headerless input (e.g. ``-f s16le -ar 48000 -ac 1``).
+    """
+    return [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        *input_args, "-i", "pipe:0",
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sr),
+        "pipe:1"
+    ]
+
+
+class FFmpegTranscoder:
+    """Decode uploads with ffmpeg subprocesses driven by asyncio, never blocking the event loop.
+
+    At most ``max_concurrency`` ffmpeg processes run at once; ``max_queue``
+    bounds how many jobs may be running or waiting. A process that runs
+    longer than ``timeout`` seconds is killed. stderr is collected in memory
+    and only logged when ffmpeg fails.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float, max_queue: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.max_queue = max(self.max_concurrency, max_queue)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+    async def transcode(self, data: bytes, sr: int = TARGET_SR) -> np.ndarray:
+        """Decode any ffmpeg-supported container (webm/opus, mp3, m4a...) to mono float32 PCM at ``sr``."""
+        if self._pending >= self.max_queue:
+            raise TranscoderBusyError(f"ffmpeg queue is full ({self._pending}/{self.max_queue} jobs)")
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                self.running += 1
+                try:
+                    return await self._run(data, sr)
+                finally:
+                    self.running -= 1
+        finally:
+            self._pending -= 1
+
+    async def _run(self, data: bytes, sr: int) -> np.ndarray:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_command(sr),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            self.failed += 1
+            raise AudioDecodeError("ffmpeg is not installed and the format is not supported by soundfile")
+
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(data), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            await self._kill(process)
+            raise AudioDecodeError(f"ffmpeg did not finish within {self.timeout}s")
+        except BaseException:
+            # Client disconnected or the request was cancelled: do not leave ffmpeg running
+            await self._kill(process)
+            raise
+
+        if process.returncode != 0:
+            self.failed += 1
+            message = stderr.decode(errors="replace").strip()
+            logger.error(f"ffmpeg exited with {process.returncode}: {message}")
+            raise AudioDecodeError(f"ffmpeg exited with {process.returncode}: {message.splitlines()[-1] if message else 'no output'}")
+
+        self.completed += 1
+        return np.frombuffer(stdout, dtype=np.float32).copy()
+
+    @staticmethod
+    async def _kill(process: asyncio.subprocess.Process) -> None:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "running": self.running,
+            "pending": self._pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+        }
+
+
+class FFmpegStreamDecoder:
+    """Long-running ffmpeg process decoding audio while it is still being received.
+
+    Encoded bytes are written to stdin as they arrive (e.g. webm/opus chunks
+    from MediaRecorder); ``read`` returns the float32 PCM decoded so far.
+    ``finish`` closes stdin and returns the rest once ffmpeg has drained.
+    """
+
+    READ_SIZE = 65536
+
+    def __init__(self, sr: int = TARGET_SR, input_args: Sequence[str] = (), timeout: float = 20.0):
+        self.sr = sr
+        self.input_args = tuple(input_args)
+        self.timeout = timeout
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._stderr: Optional[asyncio.Task] = None
+        self._remainder = b""
+
+    async def start(self) -> None:
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *ffmpeg_command(self.sr, self.input_args),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            raise AudioDecodeError("ffmpeg is not installed, cannot decode streamed audio")
+        self._stderr = asyncio.create_task(self._process.stderr.read())
+
+    async def write(self, data: bytes) -> None:
+        if self._process is None:
+            await self.start()
+        try:
+            self._process.stdin.write(data)
+            await self._process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            raise AudioDecodeError(await self._failure_message())
+
+    async def read(self) -> Optional[np.ndarray]:
+        """Next block of decoded samples, or None once ffmpeg has closed its output."""
+        data = await self._process.stdout.read(self.READ_SIZE)
+        if not data:
+            return None
+        data = self._remainder + data
+        usable = len(data) - len(data) % 4
+        self._remainder = data[usable:]
+        return np.frombuffer(data[:usable], dtype=np.float32).copy()
+
+    async def close_input(self) -> None:
+        if self._process is not None and not self._process.stdin.is_closing():
+            self._process.stdin.close()
+
+    async def wait(self) -> None:
+        """Wait for ffmpeg to exit after ``close_input``, raising AudioDecodeError on failure."""
+        try:
+            await asyncio.wait_for(self._process.wait(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            await FFmpegTranscoder._kill(self._process)
+            raise AudioDecodeError(f"ffmpeg did not finish within {self.timeout}s")
+        if self._process.returncode != 0:
+            raise AudioDecodeError(await self._failure_message())
+
+    async def _failure_message(self) -> str:
+        await FFmpegTranscoder._kill(self._process)
+        message = (await self._stderr).decode(errors="replace").strip() if self._stderr is not None else ""
+        logger.error(f"Streaming ffmpeg exited with {self._process.returncode}: {message}")
+        return f"ffmpeg exited with {self._process.returncode}: {message.splitlines()[-1] if message else 'no output'}"
+
+    async def aclose(self) -> None:
+        """Kill ffmpeg if it is still running (client went away or the stream failed)."""
+        if self._process is not None:
+            await FFmpegTranscoder._kill(self._process)
+        if self._stderr is not None and not self._stderr.done():
+            self._stderr.cancel()
+
+
+async def decode_audio(data: bytes, sr: int = TARGET_SR,
+                       transcoder: Optional[FFmpegTranscoder] = None) -> np.ndarray:
+    """Decode uploaded bytes to a mono float32 buffer at ``sr``.
+
+    libsndfile handles WAV and friends in a worker thread without spawning a
+    process; browser formats such as webm/opus go through ``transcoder``.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio data")
+    try:
+        with stage("decode"):
+            return await asyncio.to_thread(decode_with_soundfile, data, sr)
+    except (sf.LibsndfileError, RuntimeError, TypeError) as e:
+        logger.info(f"soundfile cannot decode upload ({str(e)}), falling back to ffmpeg")
+    if transcoder is None:
+        raise AudioDecodeError("Format is not supported by soundfile and no ffmpeg transcoder is configured")
+    with stage("transcode"):
+        y = await transcoder.transcode(data, sr)
+    if len(y) == 0:
+        raise AudioDecodeError("Decoded audio is empty")
+    return y
+
+
+def encode_wav(y: np.ndarray, sr: int = TARGET_SR) -> bytes:
+    """Encode a float buffer as 16-bit PCM WAV bytes (e.g. for the ASR upload)."""
+    buffer = io.BytesIO()
+    sf.write(buffer, y, sr, format="WAV", subtype="PCM_16")
+    return buffer.getvalue()
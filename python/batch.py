@@ -0,0 +1,157 @@
+"""Batch analysis: many (audio, reference_text, sample_id) items in one upload.
+
+Items come either as several multipart files or as one zip archive, with an
+optional JSON manifest describing each item. ``run_batch`` analyzes them
+concurrently and yields one result per item in completion order, so the
+endpoint can stream NDJSON lines while the rest of the batch is still running.
+"""
+import asyncio
+import io
+import json
+import os
+import zipfile
+import zlib
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+MANIFEST_NAME = "manifest.json"
+
+
+class BatchError(ValueError):
+    """Raised for a malformed batch upload (bad manifest, missing files, too many items)."""
+
+
+class BatchItem(NamedTuple):
+    index: int
+    id: str
+    filename: str
+    content: bytes
+    reference_text: Optional[str]
+    sample_id: Optional[str]
+
+
+def parse_manifest(text: Optional[str]) -> Optional[List[Dict[str, Any]]]:
+    """Parse ``[{"file", "reference_text", "sample_id", "id"}, ...]``; None when no manifest is given."""
+    if not text or not text.strip():
+        return None
+    try:
+        manifest = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise BatchError(f"Invalid batch manifest: {str(e)}")
+    if isinstance(manifest, dict):
+        manifest = manifest.get("items")
+    if not isinstance(manifest, list) or not all(isinstance(entry, dict) for entry in manifest):
+        raise BatchError("Batch manifest must be a list of objects")
+    return manifest
+
+
+def build_items(files: Sequence[Tuple[str, bytes]], manifest: Optional[List[Dict[str, Any]]],
+                default_reference_text: Optional[str] = None, default_sample_id: Optional[str] = None,
+                max_items: int = 50) -> List[BatchItem]:
+    """Pair uploaded ``(filename, content)`` files with manifest entries.
+
+    Without a manifest every file is one item using the default reference
+    text and sample. Manifest entries name their file (``file``) or, failing
+    that, take the file at the same position.
+    """
+    if manifest is None:
+        manifest = [{"file": filename} for filename, _ in files]
+    if not manifest:
+        raise BatchError("Batch contains no audio files")
+    if len(manifest) > max_items:
+        raise BatchError(f"Batch has {len(manifest)} items, at most {max_items} are allowed")
+
+    by_name = {filename: content for filename, content in files}
+    items = []
+    for index, entry in enumerate(manifest):
+        filename = entry.get("file")
+        if filename is None:
+            if index >= len(files):
+                raise BatchError(f"Batch item {index} has no file")
+            filename, content = files[index]
+        elif filename in by_name:
+            content = by_name[filename]
+        else:
+            raise BatchError(f"Batch item {index} refers to missing file '{filename}'")
+        items.append(BatchItem(
+            index=index,
+            id=str(entry.get("id", index)),
+            filename=filename,
+            content=content,
+            reference_text=entry.get("reference_text") or default_reference_text,
+            sample_id=entry.get("sample_id") or default_sample_id,
+        ))
+    return items
+
+
+async def read_uploads(uploads: Sequence[Any], max_items: int = 50,
+                       max_bytes: int = 200 * 1024 * 1024) -> List[Tuple[str, bytes]]:
+    """``(filename, content)`` of multipart uploads, with the same limits as ``read_zip``.
+
+    The file count is checked before anything is read and each file is read
+    only up to the remaining byte budget, so an oversized upload is rejected
+    without being buffered in memory.
+    """
+    if len(uploads) > max_items:
+        raise BatchError(f"Batch has {len(uploads)} files, at most {max_items} are allowed")
+    files = []
+    remaining = max_bytes
+    for index, upload in enumerate(uploads):
+        content = await upload.read(remaining + 1)
+        if len(content) > remaining:
+            raise BatchError(f"Batch files exceed {max_bytes} bytes")
+        remaining -= len(content)
+        files.append((upload.filename or f"item-{index}", content))
+    return files
+
+
+def read_zip(data: bytes, max_items: int = 50, max_bytes: int = 200 * 1024 * 1024) -> Tuple[List[Tuple[str, bytes]], Optional[str]]:
+    """Audio files (sorted by name) and the ``manifest.json`` text of a zip archive.
+
+    Sizes are checked against the central directory before anything is
+    inflated, so an oversized or highly compressed archive is rejected early.
+    """
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(data))
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Invalid zip archive: {str(e)}")
+    with archive:
+        # Skip directories and macOS metadata (__MACOSX/, ._ and dot files)
+        entries = [info for info in archive.infolist()
+                   if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+                   and not os.path.basename(info.filename).startswith(".")]
+        manifest_info = next((info for info in entries if os.path.basename(info.filename) == MANIFEST_NAME), None)
+        audio_entries = sorted((info for info in entries if info is not manifest_info), key=lambda info: info.filename)
+        if len(audio_entries) > max_items:
+            raise BatchError(f"Archive has {len(audio_entries)} files, at most {max_items} are allowed")
+        total = sum(info.file_size for info in entries)
+        if total > max_bytes:
+            raise BatchError(f"Archive expands to {total} bytes, at most {max_bytes} are allowed")
+        try:
+            manifest = archive.read(manifest_info).decode("utf-8") if manifest_info is not None else None
+            return [(info.filename, archive.read(info)) for info in audio_entries], manifest
+        except (zipfile.BadZipFile, zlib.error, UnicodeDecodeError) as e:
+            raise BatchError(f"Cannot extract zip archive: {str(e)}")
+
+
+async def run_batch(items: Sequence[BatchItem], analyze: Callable[[BatchItem], Awaitable[Dict[str, Any]]],
+                    max_concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """Run ``analyze`` on every item with at most ``max_concurrency`` in flight; yield results as they finish.
+
+    ``analyze`` must turn failures into result dicts itself. Closing the
+    generator early (client disconnected) cancels the remaining items.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def limited(item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            return await analyze(item)
+
+    tasks = [asyncio.create_task(limited(item)) for item in items]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,120 @@
+"""Runtime and contour agreement of every pitch tracker against pyin.
+
+Usage (from the python/ directory):
+    python -m benchmarks.pitch_trackers [--durations 1 3 5] [--repeat 3] [--wav a.wav ...] [--json out.json]
+
+For synthetic signals the error against the true F0 is reported as well.
+"""
+import argparse
+import json
+import time
+from typing import Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+from pitch_trackers import PITCH_TRACKERS, track_pitch
+from benchmarks.synthetic import SR, vowel
+
+# A frame counts as a gross error when it is off by more than 20% (~316 cents)
+GROSS_ERROR_CENTS = 1200 * np.log2(1.2)
+
+
+def resample_track(times: np.ndarray, f0: np.ndarray, voiced: np.ndarray,
+                   target_times: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Nearest-frame resampling of a pitch track onto another time grid."""
+    if len(times) == 0:
+        return np.full(len(target_times), np.nan), np.zeros(len(target_times), dtype=bool)
+    idx = np.clip(np.searchsorted(times, target_times), 1, len(times) - 1)
+    idx -= (target_times - times[idx - 1]) < (times[idx] - target_times)
+    return f0[idx], voiced[idx]
+
+
+def agreement(f0: np.ndarray, voiced: np.ndarray, ref_f0: np.ndarray, ref_voiced: np.ndarray) -> Dict[str, float]:
+    """Voicing agreement plus median and gross cent error over frames voiced in both tracks."""
+    both = voiced & ref_voiced
+    result = {
+        "voicing_agreement": float(np.mean(voiced == ref_voiced)) if len(voiced) else 0.0,
+        "frames_compared": int(np.sum(both)),
+        "median_abs_cents": None,
+        "gross_error_rate": None,
+    }
+    if np.any(both):
+        cents = np.abs(1200 * np.log2(f0[both] / ref_f0[both]))
+        result["median_abs_cents"] = float(np.median(cents))
+        result["gross_error_rate"] = float(np.mean(cents > GROSS_ERROR_CENTS))
+    return result
+
+
+def time_tracker(name: str, y: np.ndarray, sr: int, repeat: int):
+    """Best-of-``repeat`` wall time (after one warm-up run) and the resulting track."""
+    track = track_pitch(y, sr, name)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        track = track_pitch(y, sr, name)
+        timings.append(time.perf_counter() - start)
+    return min(timings), track
+
+
+def benchmark_signal(label: str, y: np.ndarray, sr: int, repeat: int,
+                     true_f0: Optional[np.ndarray] = None) -> List[Dict]:
+    rows = []
+    ref_runtime, (ref_times, ref_f0, ref_voiced) = time_tracker("pyin", y, sr, repeat)
+    for name in PITCH_TRACKERS:
+        if name == "pyin":
+            runtime, (times, f0, voiced) = ref_runtime, (ref_times, ref_f0, ref_voiced)
+        else:
+            runtime, (times, f0, voiced) = time_tracker(name, y, sr, repeat)
+        f0_on_ref, voiced_on_ref = resample_track(times, f0, voiced, ref_times)
+        row = {
+            "signal": label,
+            "duration": len(y) / sr,
+            "tracker": name,
+            "runtime_s": runtime,
+            "speedup_vs_pyin": ref_runtime / runtime if runtime > 0 else None,
+            "vs_pyin": agreement(f0_on_ref, voiced_on_ref, ref_f0, ref_voiced),
+        }
+        if true_f0 is not None:
+            truth = true_f0[np.clip((times * sr).astype(int), 0, len(true_f0) - 1)]
+            row["vs_truth"] = agreement(f0, voiced, truth, np.ones(len(truth), dtype=bool))
+        rows.append(row)
+    return rows
+
+
+def _fmt(value, pattern):
+    return pattern.format(value) if value is not None else "-"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[1.0, 3.0, 5.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--wav", nargs="*", default=[], help="Real recordings to include")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    rows = []
+    for duration in args.durations:
+        y, true_f0 = vowel(duration)
+        rows.extend(benchmark_signal(f"vowel_glide_{duration:g}s", y, SR, args.repeat, true_f0))
+    for path in args.wav:
+        y, _ = librosa.load(path, sr=SR)
+        rows.extend(benchmark_signal(path, y, SR, args.repeat))
+
+    print(f"{'signal':<28}{'tracker':<8}{'time (ms)':>10}{'speedup':>9}{'voicing':>9}{'cents':>8}{'gross':>8}{'cents*':>8}")
+    for row in rows:
+        vs_pyin, vs_truth = row["vs_pyin"], row.get("vs_truth") or {}
+        print(f"{row['signal']:<28}{row['tracker']:<8}{row['runtime_s'] * 1000:>10.1f}"
+              f"{_fmt(row['speedup_vs_pyin'], '{:.1f}x'):>9}{vs_pyin['voicing_agreement']:>9.2f}"
+              f"{_fmt(vs_pyin['median_abs_cents'], '{:.1f}'):>8}{_fmt(vs_pyin['gross_error_rate'], '{:.2f}'):>8}"
+              f"{_fmt(vs_truth.get('median_abs_cents'), '{:.1f}'):>8}")
+    print("cents/gross: agreement with pyin on frames voiced in both; cents*: median error against the true F0")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""Runtime of every analysis stage on deterministic synthetic audio and fixed sentences.
+
+Usage (from the python/ directory):
+    python -m benchmarks.stages [--durations 1 3 6] [--repeat 3] [--groups pitch formant ...]
+                                [--json out.json] [--baseline old.json] [--tolerance 0.25]
+
+Groups:
+    pitch     every pitch tracker on every signal (in process)
+    formant   Burg formant tracks on every signal (in process)
+    features  main.analyze_audio_features per tracker, through the DSP pool like the service
+    phoneme   main.simulate_phoneme_analysis
+    words     main.compare_words, compare_words_enhanced and combine_phoneme_errors_with_words
+    kana      kana helpers of main
+    text      kana_key + normalized_similarity text scoring
+
+Text stages run "cold" (kana and edit-distance caches cleared before every
+run, i.e. a sentence seen for the first time) and "warm" (served from cache).
+
+Each result is the best, median and mean of ``--repeat`` runs after one
+warm-up run. With ``--baseline`` the medians are compared against an earlier
+``--json`` output and the exit status is 1 when a case is slower than
+``1 + tolerance`` times its baseline.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Simulated LLM analysis and a single DSP worker: never call the API, keep timings comparable across machines
+os.environ["OPENAI_API_KEY"] = ""
+os.environ.setdefault("DSP_POOL_SIZE", "1")
+
+import numpy as np
+
+import audio_features
+import main
+from benchmarks.synthetic import SIGNALS, SR
+from pitch_trackers import PITCH_TRACKERS, track_pitch
+from sentence_catalog import SAMPLE_SENTENCES
+from text_similarity import SIMILARITY_BACKEND, levenshtein_distance, normalized_similarity
+
+GROUPS = ("pitch", "formant", "features", "phoneme", "words", "kana", "text")
+
+
+def transcription_variants(reference: str) -> Dict[str, str]:
+    """Typical ASR outcomes for a reference sentence: exact, one kana swapped, truncated, extra particle."""
+    hiragana = main.kana.analyze(reference).hiragana
+    middle = len(hiragana) // 2
+    swapped = hiragana[:middle] + ("か" if hiragana[middle] != "か" else "さ") + hiragana[middle + 1:]
+    return {
+        "exact": reference,
+        "substitution": swapped,
+        "truncated": reference[:max(1, len(reference) * 2 // 3)],
+        "insertion": reference + "ね",
+    }
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    return {
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+    }
+
+
+def time_sync(fn: Callable[[], Any], repeat: int, setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    """Time ``fn()`` ``repeat`` times after one warm-up run; ``setup()`` runs untimed before each call."""
+    timings = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        if i:
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+async def time_async(fn: Callable[[], Awaitable[Any]], repeat: int,
+                     setup: Optional[Callable[[], Any]] = None) -> Dict[str, float]:
+    timings = []
+    for i in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        await fn()
+        if i:
+            timings.append(time.perf_counter() - start)
+    return summarize(timings)
+
+
+class Bench:
+    """Collects result rows and prints each one as it is measured."""
+
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.rows: List[Dict[str, Any]] = []
+
+    def add(self, stage: str, case: str, stats: Dict[str, float], **extra: Any) -> None:
+        row = {"stage": stage, "case": case, **extra, "repeat": self.repeat, **stats}
+        self.rows.append(row)
+        print(f"{stage:<34}{case:<34}{stats['median_s'] * 1000:>11.3f}{stats['min_s'] * 1000:>11.3f}", flush=True)
+
+
+def bench_pitch(bench: Bench, signals: Dict[str, np.ndarray]) -> None:
+    for label, y in signals.items():
+        for tracker in PITCH_TRACKERS:
+            bench.add(f"pitch.{tracker}", label, time_sync(lambda: track_pitch(y, SR, tracker), bench.repeat),
+                      audio_s=len(y) / SR)
+
+
+def bench_formant(bench: Bench, signals: Dict[str, np.ndarray]) -> None:
+    for label, y in signals.items():
+        bench.add("formant.burg", label, time_sync(lambda: audio_features.formant_tracks(y, SR), bench.repeat),
+                  audio_s=len(y) / SR)
+
+
+async def bench_features(bench: Bench, signals: Dict[str, np.ndarray], sentence: str) -> None:
+    main.dsp_executor.start(warmup=audio_features.warmup)
+    try:
+        for tracker in PITCH_TRACKERS:
+            sample_by_length: Dict[int, Dict[str, Any]] = {}
+            for label, y in signals.items():
+                # Reference features of a glide of the same length, computed once like the sample cache does
+                if len(y) not in sample_by_length:
+                    sample_by_length[len(y)] = audio_features.sample_features(
+                        SIGNALS["glide"](len(y) / SR), SR, tracker)
+                sample_features = sample_by_length[len(y)]
+                stats = await time_async(
+                    lambda: main.analyze_audio_features(y, SR, None, sentence, sentence,
+                                                        sample_features=sample_features, pitch_tracker=tracker),
+                    bench.repeat)
+                bench.add(f"analyze_audio_features.{tracker}", label, stats, audio_s=len(y) / SR)
+    finally:
+        main.dsp_executor.shutdown()
+
+
+def clear_text_caches() -> None:
+    main.kana.clear()
+    levenshtein_distance.cache_clear()
+
+
+CACHE_STATES = {"cold": clear_text_caches, "warm": None}
+
+
+async def bench_phoneme(bench: Bench, pairs: Dict[str, tuple]) -> None:
+    for case, (reference, transcription) in pairs.items():
+        for state, setup in CACHE_STATES.items():
+            bench.add("simulate_phoneme_analysis", f"{case}/{state}", await time_async(
+                lambda: main.simulate_phoneme_analysis(None, reference, transcription), bench.repeat, setup))
+
+
+async def bench_words(bench: Bench, pairs: Dict[str, tuple]) -> None:
+    llm_result = {"incorrect_words": [], "auxiliary_words": ["ね", "よ"], "personalized_feedback": ""}
+    for case, (reference, transcription) in pairs.items():
+        for state, setup in CACHE_STATES.items():
+            bench.add("compare_words", f"{case}/{state}", await time_async(
+                lambda: main.compare_words(reference, transcription), bench.repeat, setup))
+            bench.add("compare_words_enhanced", f"{case}/{state}", await time_async(
+                lambda: main.compare_words_enhanced(reference, transcription, llm_result), bench.repeat, setup))
+        # Works on precomputed inputs only, so there is no cold variant
+        words, _, _ = await main.compare_words_enhanced(reference, transcription, llm_result)
+        phoneme_errors = await main.simulate_phoneme_analysis(None, reference, transcription)
+        analysis = main.kana.analyze(reference)
+        bench.add("combine_phoneme_errors_with_words", case, await time_async(
+            lambda: main.combine_phoneme_errors_with_words(words, phoneme_errors, analysis), bench.repeat))
+
+
+async def bench_kana(bench: Bench, sentences: Dict[str, str]) -> None:
+    helpers = {
+        "to_hiragana": main.to_hiragana,
+        "count_syllables": main.count_syllables,
+        "tokenize_japanese": main.tokenize_japanese,
+        "token_hiragana_map": main.token_hiragana_map,
+    }
+    for name, helper in helpers.items():
+        for case, text in sentences.items():
+            for state, setup in CACHE_STATES.items():
+                bench.add(f"kana.{name}", f"{case}/{state}", await time_async(
+                    lambda: helper(text), bench.repeat, setup))
+
+
+def bench_text(bench: Bench, pairs: Dict[str, tuple]) -> None:
+    def score(reference: str, transcription: str) -> float:
+        return normalized_similarity(main.kana_key(reference), main.kana_key(transcription))
+
+    for case, (reference, transcription) in pairs.items():
+        for state, setup in CACHE_STATES.items():
+            bench.add("text_scoring", f"{case}/{state}", time_sync(
+                lambda: score(reference, transcription), bench.repeat, setup), backend=SIMILARITY_BACKEND)
+
+
+def environment() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "dsp_pool_size": main.DSP_POOL_SIZE,
+    }
+
+
+def compare(rows: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[Dict[str, Any]]:
+    """Cases whose median got slower than ``1 + tolerance`` times the baseline median."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(row["stage"], row["case"]): row for row in json.load(f)["results"]}
+    regressions = []
+    print(f"\nAgainst {baseline_path} (median, slower than {1 + tolerance:.2f}x marked with !):")
+    for row in rows:
+        old = baseline.get((row["stage"], row["case"]))
+        if old is None or old["median_s"] <= 0:
+            continue
+        ratio = row["median_s"] / old["median_s"]
+        flag = "!" if ratio > 1 + tolerance else " "
+        print(f"{flag} {row['stage']:<34}{row['case']:<34}{ratio:>7.2f}x")
+        if flag == "!":
+            regressions.append(dict(row, baseline_median_s=old["median_s"], ratio=ratio))
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    bench = Bench(args.repeat)
+    signals = {f"{name}_{duration:g}s": generate(duration)
+               for duration in args.durations for name, generate in SIGNALS.items()}
+    sentences = dict(SAMPLE_SENTENCES)
+    reference = SAMPLE_SENTENCES["weather_good"]
+    pairs = {f"{sentence_id}/{variant}": (text, transcription)
+             for sentence_id, text in sentences.items()
+             for variant, transcription in transcription_variants(text).items()}
+
+    print(f"{'stage':<34}{'case':<34}{'median ms':>11}{'min ms':>11}")
+    if "pitch" in args.groups:
+        bench_pitch(bench, signals)
+    if "formant" in args.groups:
+        bench_formant(bench, signals)
+    if "features" in args.groups:
+        await bench_features(bench, signals, reference)
+    if "phoneme" in args.groups:
+        await bench_phoneme(bench, pairs)
+    if "words" in args.groups:
+        await bench_words(bench, pairs)
+    if "kana" in args.groups:
+        await bench_kana(bench, sentences)
+    if "text" in args.groups:
+        bench_text(bench, pairs)
+    return bench.rows
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--durations", type=float, nargs="+", default=[1.0, 3.0, 6.0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=list(GROUPS))
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown of a median against the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # The pipeline logs every step (and warns about silent/unvoiced test signals); keep the table readable
+    logging.getLogger().setLevel(logging.ERROR)
+    rows = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "args": vars(args), "results": rows}, f,
+                      indent=2, ensure_ascii=False)
+    if args.baseline and compare(rows, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,99 @@
+"""Deterministic speech-like test signals with known F0."""
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+from scipy.signal import lfilter
+
+SR = 16000
+
+# F1-F3 (Hz) and bandwidths for a neutral Japanese /a/
+VOWEL_A_FORMANTS = ((800.0, 80.0), (1200.0, 90.0), (2500.0, 120.0))
+# Approximate F1-F3 of the five Japanese vowels (adult male)
+JAPANESE_VOWEL_FORMANTS = {
+    "a": VOWEL_A_FORMANTS,
+    "i": ((300.0, 60.0), (2300.0, 100.0), (3000.0, 140.0)),
+    "u": ((350.0, 60.0), (1300.0, 90.0), (2500.0, 120.0)),
+    "e": ((500.0, 70.0), (1900.0, 100.0), (2600.0, 120.0)),
+    "o": ((500.0, 70.0), (850.0, 80.0), (2500.0, 120.0)),
+}
+
+
+def f0_glide(duration: float, f0_start: float = 120.0, f0_end: float = 220.0, sr: int = SR) -> np.ndarray:
+    """Per-sample F0 contour rising (or falling) linearly between two values."""
+    return np.linspace(f0_start, f0_end, int(duration * sr), endpoint=False)
+
+
+def pulse_train(f0: np.ndarray, sr: int = SR) -> np.ndarray:
+    """Glottal-like impulse train following a per-sample F0 contour."""
+    phase = np.cumsum(f0 / sr)
+    pulses = np.zeros_like(f0)
+    pulses[1:][np.diff(np.floor(phase)) > 0] = 1.0
+    # Smooth each impulse into a short decaying glottal pulse
+    return lfilter([1.0], [1.0, -0.95], pulses)
+
+
+def formant_filter(x: np.ndarray, formants=VOWEL_A_FORMANTS, sr: int = SR) -> np.ndarray:
+    """Cascade of second-order resonators, one per (frequency, bandwidth) pair."""
+    y = x
+    for freq, bandwidth in formants:
+        r = np.exp(-np.pi * bandwidth / sr)
+        theta = 2 * np.pi * freq / sr
+        y = lfilter([1 - r], [1, -2 * r * np.cos(theta), r * r], y)
+    return y
+
+
+def vowel(duration: float, f0_start: float = 120.0, f0_end: float = 220.0, sr: int = SR,
+          seed: int = 0, noise_db: float = -40.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Formant-filtered pulse train with a pitch glide; returns (signal, per-sample true F0)."""
+    f0 = f0_glide(duration, f0_start, f0_end, sr)
+    y = formant_filter(pulse_train(f0, sr), sr=sr)
+    y = 0.3 * y / (np.max(np.abs(y)) or 1.0)
+    rng = np.random.default_rng(seed)
+    y += rng.normal(0.0, 10 ** (noise_db / 20), len(y))
+    return y.astype(np.float32), f0
+
+
+def vowel_sequence(duration: float, sr: int = SR, seed: int = 0, syllable: float = 0.25,
+                   pause: float = 0.05, noise_db: float = -40.0) -> np.ndarray:
+    """Syllable-length /a i u e o/ segments with alternating rising and falling glides, separated by pauses."""
+    rng = np.random.default_rng(seed)
+    vowels = list(JAPANESE_VOWEL_FORMANTS.values())
+    segment_samples = int(syllable * sr)
+    pause_samples = int(pause * sr)
+    out = np.zeros(int(duration * sr), dtype=np.float64)
+    position, index = 0, 0
+    while position < len(out):
+        length = min(segment_samples, len(out) - position)
+        f0_start, f0_end = (130.0, 190.0) if index % 2 == 0 else (190.0, 140.0)
+        f0 = np.linspace(f0_start, f0_end, length, endpoint=False)
+        segment = formant_filter(pulse_train(f0, sr), vowels[index % len(vowels)], sr)
+        # Short fades so segment boundaries do not click
+        fade = min(length // 2, int(0.01 * sr))
+        if fade:
+            ramp = np.linspace(0.0, 1.0, fade)
+            segment[:fade] *= ramp
+            segment[-fade:] *= ramp[::-1]
+        out[position:position + length] = 0.3 * segment / (np.max(np.abs(segment)) or 1.0)
+        position += length + pause_samples
+        index += 1
+    out += rng.normal(0.0, 10 ** (noise_db / 20), len(out))
+    return out.astype(np.float32)
+
+
+def noise(duration: float, sr: int = SR, seed: int = 0, level_db: float = -20.0) -> np.ndarray:
+    """White noise at ``level_db`` RMS (dBFS): loud enough to be analyzed, but unvoiced."""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0.0, 10 ** (level_db / 20), int(duration * sr)).astype(np.float32)
+
+
+def silence(duration: float, sr: int = SR) -> np.ndarray:
+    return np.zeros(int(duration * sr), dtype=np.float32)
+
+
+# Named signal generators taking a duration in seconds, for the benchmarks
+SIGNALS: Dict[str, Callable[[float], np.ndarray]] = {
+    "glide": lambda duration: vowel(duration)[0],
+    "vowels": vowel_sequence,
+    "noise": noise,
+    "silence": silence,
+}
@@ -0,0 +1,43 @@
+"""Precompile the lesson sentence catalog (tokens, kana spans, morae, syllables).
+
+Usage:
+    python build_sentence_catalog.py --sql ../ddl/02-init-data.sql --out sentence_catalog.json
+
+Point the service at the result with SENTENCE_CATALOG_PATH; without it the
+catalog is built from the same sources at startup.
+"""
+import argparse
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+from kana import KanaConverter
+from sentence_catalog import build_sentence_catalog, catalog_sentences, write_sentence_catalog
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("build_sentence_catalog")
+
+
+def main() -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the lesson sentence catalog")
+    parser.add_argument("--sql", default=os.getenv("LESSON_DATA_SQL", "../ddl/02-init-data.sql"),
+                        help="Seed-data SQL file with the vocabulary terms and examples")
+    parser.add_argument("--out", default=os.getenv("SENTENCE_CATALOG_PATH", "sentence_catalog.json"))
+    args = parser.parse_args()
+
+    sentences = catalog_sentences(args.sql)
+    catalog = build_sentence_catalog(sentences, KanaConverter(maxsize=len(sentences)))
+    for analysis in catalog.analyses():
+        logger.info(f"{analysis.text}: {len(analysis.tokens)} tokens, {len(analysis.morae)} morae, "
+                    f"{analysis.syllables} syllables")
+
+    count = write_sentence_catalog(args.out, catalog)
+    logger.info(f"Wrote sentence catalog with {count} sentences ({len(sentences)} IDs) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
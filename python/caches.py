@@ -0,0 +1,207 @@
+"""In-memory LRU/TTL cache with an optional persistent SQLite backing store."""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def content_key(*parts: Any) -> str:
+    """Stable SHA-256 key over JSON-serializable parts."""
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def audio_fingerprint(y: np.ndarray, sr: int) -> str:
+    """SHA-256 over decoded PCM samples and sample rate (independent of the upload container)."""
+    digest = hashlib.sha256(str(sr).encode("ascii"))
+    digest.update(np.ascontiguousarray(y, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def shared_call(inflight: Dict[Any, "asyncio.Task"], key: Any,
+                factory: Callable[[], Awaitable[Any]]) -> Awaitable[Any]:
+    """Await ``factory()``, run once per ``key`` in its own task shared by concurrent callers.
+
+    Callers await the task through ``asyncio.shield``, so cancelling one of
+    them (including the one that started it) neither cancels the work nor
+    the other callers. The task leaves ``inflight`` when it finishes.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        inflight[key] = task
+        task.add_done_callback(functools.partial(_finish_shared_call, inflight, key))
+    return asyncio.shield(task)
+
+
+def _finish_shared_call(inflight: Dict[Any, "asyncio.Task"], key: Any, task: "asyncio.Task") -> None:
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        # Mark the exception as retrieved when every caller has gone away
+        task.exception()
+
+
+class SqliteStore:
+    """Persistent key -> JSON value store; entries older than ``ttl`` are ignored."""
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return _MISSING
+        value, created = row
+        if self.ttl is not None and time.time() - created > self.ttl:
+            self.delete(key)
+            return _MISSING
+        return json.loads(value)
+
+    def set(self, key: str, value: Any) -> None:
+        data = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                (key, data, time.time())
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def prune(self) -> int:
+        """Remove expired rows and return how many were deleted."""
+        if self.ttl is None:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry time-to-live.
+
+    When a ``store`` is given, misses fall through to it and hits are promoted
+    back into memory; writes go to both. Coroutines use ``aget``/``aset`` so
+    that the store's disk I/O does not block the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: Optional[float] = None, store: Optional[SqliteStore] = None,
+                 name: str = "cache"):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.store = store
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self._get_memory(key)
+        if value is _MISSING and self.store is not None:
+            value = self._get_store(key)
+        return self._count(value, default)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """``get`` for coroutines: the persistent store is read in a worker thread, off the event loop."""
+        value = self._get_memory(key)
+        if value is _MISSING and self.store is not None:
+            value = await asyncio.to_thread(self._get_store, key)
+        return self._count(value, default)
+
+    def _get_memory(self, key: str) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._data.move_to_end(key)
+                    return value
+                del self._data[key]
+        return _MISSING
+
+    def _get_store(self, key: str) -> Any:
+        value = self.store.get(key)
+        if value is not _MISSING:
+            self._put(key, value)
+        return value
+
+    def _count(self, value: Any, default: Any) -> Any:
+        with self._lock:
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._put(key, value)
+        if self.store is not None:
+            self._set_store(key, value)
+
+    async def aset(self, key: str, value: Any) -> None:
+        """``set`` for coroutines: the persistent store is written in a worker thread, off the event loop."""
+        self._put(key, value)
+        if self.store is not None:
+            await asyncio.to_thread(self._set_store, key, value)
+
+    def _set_store(self, key: str, value: Any) -> None:
+        try:
+            self.store.set(key, value)
+        except Exception as e:
+            logger.error(f"Error writing {self.name} entry to persistent store: {str(e)}")
+
+    def _put(self, key: str, value: Any) -> None:
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent": self.store is not None,
+        }
@@ -0,0 +1,146 @@
+"""Bounded process pool that keeps DSP work off the asyncio event loop."""
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DSPQueueFullError(RuntimeError):
+    """Raised when the pool already holds the maximum number of queued tasks."""
+
+
+class DSPTimeoutError(RuntimeError):
+    """Raised when a DSP task does not finish within the per-task timeout."""
+
+
+class DSPExecutor:
+    """Run synchronous DSP functions in worker processes with admission control.
+
+    ``max_queue`` bounds the number of tasks submitted to the pool (running and
+    waiting). A timed-out task is abandoned by the caller but keeps its worker
+    busy until it finishes, so it is still counted against ``max_queue``.
+
+    When a worker dies the pool is broken: it is replaced, its outstanding
+    tasks stop counting against ``max_queue`` and each affected call is
+    retried once on the new pool.
+    """
+
+    def __init__(self, max_workers: int, task_timeout: float, max_queue: int,
+                 start_method: str = "spawn"):
+        self.max_workers = max(1, max_workers)
+        self.task_timeout = task_timeout
+        self.max_queue = max(self.max_workers, max_queue)
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        # Admitted futures and the pool they were submitted to
+        self._futures: Dict[Future, ProcessPoolExecutor] = {}
+        self._lock = threading.Lock()
+
+    def start(self, warmup: Optional[Callable[[], Any]] = None) -> None:
+        """Create the worker pool, optionally spawning every worker up front."""
+        if self._pool is not None:
+            return
+        self._pool = self._create_pool()
+        logger.info(f"DSP pool started with {self.max_workers} workers ({self.start_method}), "
+                    f"timeout={self.task_timeout}s, max_queue={self.max_queue}")
+        if warmup is not None:
+            for _ in range(self.max_workers):
+                self._pool.submit(warmup)
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context(self.start_method)
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            logger.info("DSP pool stopped")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def is_saturated(self) -> bool:
+        return self._pending >= self.max_queue
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            # Futures abandoned by _replace_locked were already uncounted
+            if self._futures.pop(future, None) is not None:
+                self._pending -= 1
+
+    def _replace_locked(self, broken: Optional[ProcessPoolExecutor]) -> Optional[ProcessPoolExecutor]:
+        """Swap in a new pool if ``broken`` is still the current one; call with ``_lock`` held."""
+        if broken is None or self._pool is not broken:
+            return None  # Already replaced by another caller
+        logger.error("DSP pool is broken, restarting it")
+        # Tasks of the dead pool never complete normally: stop counting them against max_queue
+        self._pending -= len(self._futures)
+        self._futures.clear()
+        self._pool = self._create_pool()
+        return broken
+
+    def _restart(self, broken: Optional[ProcessPoolExecutor]) -> None:
+        with self._lock:
+            old = self._replace_locked(broken)
+        if old is not None:
+            # Outside the lock: cancelling the old futures runs _release, which takes it
+            old.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[Future, ProcessPoolExecutor]:
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise DSPQueueFullError(f"DSP queue is full ({self._pending}/{self.max_queue} tasks)")
+            pool = self._pool
+            try:
+                future = pool.submit(fn, *args)
+            except BrokenProcessPool:
+                old = self._replace_locked(pool)
+            else:
+                old = None
+                self._pending += 1
+                self._futures[future] = pool
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=True)
+            raise BrokenProcessPool("DSP pool was broken")
+        future.add_done_callback(self._release)
+        return future, pool
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """Submit ``fn(*args)`` to the pool and await its result.
+
+        A call that fails because the pool broke is retried once on the
+        restarted pool; a second failure is reported as ``DSPTimeoutError``.
+        """
+        if self._pool is None:
+            self.start()
+
+        name = getattr(fn, '__name__', fn)
+        for attempt in (1, 2):
+            pool = None
+            try:
+                future, pool = self._submit(fn, args)
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.task_timeout)
+            except asyncio.TimeoutError:
+                raise DSPTimeoutError(f"DSP task {name} exceeded {self.task_timeout}s")
+            except BrokenProcessPool:
+                self._restart(pool)
+                if attempt == 2:
+                    raise DSPTimeoutError(f"DSP task {name} failed: worker process died twice")
+                logger.warning(f"Retrying DSP task {name} on the restarted pool")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_queue": self.max_queue,
+            "task_timeout": self.task_timeout,
+            "running": self._pool is not None,
+        }
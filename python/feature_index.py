@@ -0,0 +1,142 @@
+"""Columnar, memory-mapped feature index for the reference sample corpus.
+
+Layout of an index directory::
+
+    index.json     sample ids, mtimes, sample rate, pitch tracker and summary stats
+    offsets.npy    int64 (N, 8): f0, f1, f2 and waveform start/end
+    f0.npy         float32, concatenated F0 tracks (NaN when unvoiced)
+    voiced.npy     bool, concatenated voiced masks (aligned with f0.npy)
+    f1.npy         float32, concatenated F1 values
+    f2.npy         float32, concatenated F2 values
+    waveform.npy   float32, concatenated waveforms
+
+The arrays are opened with ``mmap_mode="r"`` so every worker shares the same
+page cache and a lookup is a dict access plus array slicing.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 3
+_COLUMNS = ("f0", "voiced", "f1", "f2", "waveform")
+
+
+class FeatureIndex:
+    """Read-only view over an index directory written by ``write_feature_index``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported feature index version: {meta.get('version')}")
+        self.sr = meta["sr"]
+        self.tracker = meta["tracker"]
+        self.ids: List[str] = meta["ids"]
+        self.mtimes: List[float] = meta["mtimes"]
+        self.stats: List[Dict[str, Any]] = meta["stats"]
+        self._positions = {sample_id: i for i, sample_id in enumerate(self.ids)}
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _COLUMNS}
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, sample_id: str) -> bool:
+        return sample_id in self._positions
+
+    def get(self, sample_id: str, sr: int, tracker: str,
+            mtime: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Features for ``sample_id`` in ``audio_features.sample_features`` format, or None if absent/stale."""
+        i = self._positions.get(sample_id)
+        if i is None or sr != self.sr or tracker != self.tracker:
+            return None
+        if mtime is not None and self.mtimes[i] != mtime:
+            return None
+        f0_start, f0_end, f1_start, f1_end, f2_start, f2_end, wave_start, wave_end = self._offsets[i]
+        f0 = self._arrays["f0"][f0_start:f0_end]
+        voiced = self._arrays["voiced"][f0_start:f0_end]
+        self.hits += 1
+        return {
+            "waveform": self._arrays["waveform"][wave_start:wave_end],
+            "sr": self.sr,
+            "tracker": self.tracker,
+            "f0": f0,
+            "voiced": voiced,
+            "pitch_contour": np.asarray(f0[voiced], dtype=np.float64),
+            "f1_values": np.asarray(self._arrays["f1"][f1_start:f1_end], dtype=np.float64),
+            "f2_values": np.asarray(self._arrays["f2"][f2_start:f2_end], dtype=np.float64),
+            "stats": self.stats[i],
+        }
+
+
+def load_feature_index(path: str) -> Optional[FeatureIndex]:
+    """Open an index directory, returning None (and logging) when it is missing or unreadable."""
+    if not path or not os.path.exists(os.path.join(path, "index.json")):
+        return None
+    try:
+        index = FeatureIndex(path)
+        logger.info(f"Memory-mapped sample feature index with {len(index)} samples from {path}")
+        return index
+    except Exception as e:
+        logger.error(f"Error loading sample feature index from {path}: {str(e)}")
+        return None
+
+
+def write_feature_index(out_dir: str, sr: int, tracker: str,
+                        entries: Iterable[Tuple[str, float, Dict[str, Any]]]) -> int:
+    """Write ``(sample_id, mtime, features)`` entries as an index directory; returns the sample count.
+
+    The directory is built next to ``out_dir`` and swapped in at the end, so a
+    running service never sees a half-written index.
+    """
+    ids, mtimes, stats, offsets = [], [], [], []
+    columns = {name: [] for name in _COLUMNS}
+    positions = {"f0": 0, "f1": 0, "f2": 0, "waveform": 0}
+
+    for sample_id, mtime, features in entries:
+        f0 = np.asarray(features["f0"], dtype=np.float32)
+        f1 = np.asarray(features["f1_values"], dtype=np.float32)
+        f2 = np.asarray(features["f2_values"], dtype=np.float32)
+        wave = np.asarray(features["waveform"], dtype=np.float32)
+        row = []
+        for name, values in (("f0", f0), ("f1", f1), ("f2", f2), ("waveform", wave)):
+            row.extend((positions[name], positions[name] + len(values)))
+            positions[name] += len(values)
+        columns["f0"].append(f0)
+        columns["voiced"].append(np.asarray(features["voiced"], dtype=bool))
+        columns["f1"].append(f1)
+        columns["f2"].append(f2)
+        columns["waveform"].append(wave)
+        ids.append(sample_id)
+        mtimes.append(mtime)
+        stats.append(features["stats"])
+        offsets.append(row)
+
+    parent = os.path.dirname(os.path.abspath(out_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".feature-index-", dir=parent)
+    try:
+        for name, chunks in columns.items():
+            dtype = bool if name == "voiced" else np.float32
+            data = np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), data)
+        np.save(os.path.join(tmp_dir, "offsets.npy"), np.asarray(offsets, dtype=np.int64).reshape(-1, 8))
+        with open(os.path.join(tmp_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "sr": sr, "tracker": tracker, "ids": ids, "mtimes": mtimes, "stats": stats},
+                      f, ensure_ascii=False)
+        if os.path.exists(out_dir):
+            shutil.rmtree(out_dir)
+        os.replace(tmp_dir, out_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return len(ids)
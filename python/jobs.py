@@ -0,0 +1,341 @@
+"""Asynchronous analysis jobs: submit now, poll or subscribe for progress, fetch the result later.
+
+``JobQueue`` runs a fixed number of asyncio workers over a queue of jobs, so
+the HTTP request that submits a job returns immediately and bursts wait in
+the queue instead of holding gateway connections open. Pipeline code calls
+``report_progress(stage)``; inside a job worker this updates the job's stage
+and wakes subscribers, elsewhere it is a no-op.
+
+With ``store_dir`` every job record (and the uploaded audio until the job
+finishes) is kept on disk, so queued jobs survive a restart and finished
+results stay pollable until ``ttl`` expires.
+"""
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_STATES = ("queued", "running", "done", "failed")
+FINISHED_STATES = ("done", "failed")
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when the maximum number of queued jobs is reached."""
+
+
+class JobError(Exception):
+    """A job failure with an HTTP-style status code, reported to clients as is."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class Job:
+    """State of one submitted analysis; ``version`` increases with every update."""
+
+    def __init__(self, job_id: str, params: Dict[str, Any], created: Optional[float] = None):
+        self.id = job_id
+        self.params = params
+        self.status = "queued"
+        self.stage: Optional[str] = None
+        self.stages: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[Dict[str, Any]] = None
+        self.created = created if created is not None else time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.version = 0
+        self._updated = asyncio.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def _touch(self) -> None:
+        self.version += 1
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+
+    async def wait_for_update(self, version: int, timeout: Optional[float] = None) -> bool:
+        """Wait until ``self.version`` moves past ``version``; False on timeout."""
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._updated.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def enter_stage(self, stage: str) -> None:
+        self.stage = stage
+        self.stages.append({"stage": stage, "at": round(time.time() - (self.started or self.created), 3)})
+        self._touch()
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": list(self.stages),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        job = cls(data["jobId"], data.get("params", {}), data.get("created"))
+        job.status = data["status"]
+        job.stage = data.get("stage")
+        job.stages = data.get("stages", [])
+        job.result = data.get("result")
+        job.error = data.get("error")
+        job.started = data.get("started")
+        job.finished = data.get("finished")
+        return job
+
+
+_current_job: ContextVar[Optional[Job]] = ContextVar("current_job", default=None)
+
+
+def report_progress(stage: str) -> None:
+    """Mark the start of a pipeline stage on the job being processed by this task, if any."""
+    job = _current_job.get()
+    if job is not None:
+        job.enter_stage(stage)
+
+
+JobHandler = Callable[[Job, bytes], Awaitable[Dict[str, Any]]]
+
+
+class JobQueue:
+    """``workers`` asyncio workers processing jobs in submission order."""
+
+    def __init__(self, handler: JobHandler, workers: int = 4, max_pending: int = 100,
+                 ttl: float = 3600.0, store_dir: Optional[str] = None):
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.ttl = ttl
+        self.store_dir = store_dir or None
+        self._jobs: Dict[str, Job] = {}
+        self._payloads: Dict[str, bytes] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        if self.store_dir:
+            os.makedirs(self.store_dir, exist_ok=True)
+            for job in await asyncio.to_thread(self._recover):
+                self._queue.put_nowait(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"Job queue started with {self.workers} workers"
+                    + (f", store {self.store_dir}" if self.store_dir else ""))
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._stopping = False
+
+    def _worker_cancelled(self) -> bool:
+        """True when the worker itself is being cancelled, not the job it runs."""
+        # Task.cancelling() only exists on Python 3.11+; stop() sets _stopping on every version
+        cancelling = getattr(asyncio.current_task(), "cancelling", None)
+        return self._stopping or (cancelling is not None and cancelling() > 0)
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, params: Dict[str, Any], payload: bytes) -> Job:
+        if self._queue is None:
+            await self.start()
+        if self.pending >= self.max_pending:
+            raise JobQueueFullError(f"Job queue is full ({self.pending}/{self.max_pending} jobs waiting)")
+        self._prune()
+        job = Job(uuid.uuid4().hex, params)
+        self._jobs[job.id] = job
+        if self.store_dir:
+            await asyncio.to_thread(self._write_payload, job.id, payload)
+            await asyncio.to_thread(self._write_record, job)
+        else:
+            self._payloads[job.id] = payload
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def updates(self, job: Job, heartbeat: float = 15.0) -> AsyncIterator[Optional[Job]]:
+        """Yield the job after every change until it finishes; None every ``heartbeat`` seconds without change."""
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                yield job
+                if job.is_finished:
+                    return
+            elif not await job.wait_for_update(version, timeout=heartbeat):
+                yield None
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                # Only stop() may end a worker; a stray CancelledError from a job must not
+                if self._worker_cancelled():
+                    raise
+                logger.error(f"Job {job.id} bookkeeping was cancelled")
+            except Exception as e:
+                logger.error(f"Job {job.id} bookkeeping failed: {str(e)}")
+
+    async def _run(self, job: Job) -> None:
+        payload = self._payloads.pop(job.id, None)
+        if payload is None and self.store_dir:
+            payload = await asyncio.to_thread(self._read_payload, job.id)
+        job.status = "running"
+        job.started = time.time()
+        job._touch()
+        self.running += 1
+        token = _current_job.set(job)
+        try:
+            if payload is None:
+                raise JobError(410, "Uploaded audio of this job is no longer available")
+            job.result = await self.handler(job, payload)
+            job.status = "done"
+            self.completed += 1
+        except JobError as e:
+            job.error = {"status": e.status_code, "detail": e.detail}
+            job.status = "failed"
+            self.failed += 1
+        except asyncio.CancelledError:
+            if self._worker_cancelled():
+                # The worker is being stopped: the job stays unfinished and is requeued on restart
+                raise
+            # Cancellation leaked from the handler (e.g. a shared computation): fail only this job
+            logger.error(f"Job {job.id} was cancelled")
+            job.error = {"status": 500, "detail": "Analysis was cancelled"}
+            job.status = "failed"
+            self.failed += 1
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = {"status": 500, "detail": str(e)}
+            job.status = "failed"
+            self.failed += 1
+        finally:
+            _current_job.reset(token)
+            self.running -= 1
+        job.finished = time.time()
+        job.stage = None
+        if self.store_dir:
+            await asyncio.to_thread(self._write_record, job)
+            await asyncio.to_thread(self._remove, self._payload_path(job.id))
+        job._touch()
+
+    def _prune(self) -> None:
+        """Forget finished jobs older than ``ttl``."""
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.is_finished and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+            if self.store_dir:
+                self._remove(self._record_path(job_id))
+
+    # --- On-disk store: <id>.json (record with params) and <id>.audio (payload until finished)
+
+    def _record_path(self, job_id: str) -> str:
+        return os.path.join(self.store_dir, f"{job_id}.json")
+
+    def _payload_path(self, job_id: str) -> str:
+        return os.path.join(self.store_dir, f"{job_id}.audio")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(prefix=".job-", dir=self.store_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_record(self, job: Job) -> None:
+        record = dict(job.to_dict(), params=job.params)
+        self._write_atomic(self._record_path(job.id), json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def _write_payload(self, job_id: str, payload: bytes) -> None:
+        self._write_atomic(self._payload_path(job_id), payload)
+
+    def _read_payload(self, job_id: str) -> Optional[bytes]:
+        try:
+            with open(self._payload_path(job_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def _recover(self) -> List[Job]:
+        """Reload job records; returns the jobs interrupted by a restart, in submission order, to queue again."""
+        requeued = []
+        for name in os.listdir(self.store_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.store_dir, name), encoding="utf-8") as f:
+                    job = Job.from_dict(json.load(f))
+            except Exception as e:
+                logger.error(f"Skipping unreadable job record {name}: {str(e)}")
+                continue
+            if not job.is_finished:
+                job.status, job.stage, job.stages, job.started = "queued", None, [], None
+                requeued.append(job)
+            self._jobs[job.id] = job
+        self._prune()
+        if self._jobs:
+            logger.info(f"Recovered {len(self._jobs)} jobs from {self.store_dir} ({len(requeued)} requeued)")
+        return sorted(requeued, key=lambda job: job.created)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "tracked": len(self._jobs),
+            "persistent": self.store_dir is not None,
+        }
@@ -0,0 +1,145 @@
+"""Cached kana analysis of Japanese text: one pykakasi pass per distinct text.
+
+``KanaConverter.analyze`` returns the whole-text hiragana, the word tokens of
+the cleaned text with their hiragana readings and spans, the mora sequence and
+the syllable count together. Results are immutable and kept in a process-wide
+LRU cache, since reference sentences come from a small fixed lesson set;
+sentences from the lesson catalog can also be pinned permanently.
+"""
+import math
+import re
+import threading
+from bisect import bisect_right
+from functools import lru_cache
+from string import punctuation
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import pykakasi
+
+# Regex để loại bỏ dấu câu và ký tự đặc biệt tiếng Nhật
+JAPANESE_PUNCTUATION = '、。！？；：「」『』・〜'
+CLEAN_REGEX = re.compile(f'[{re.escape(punctuation + JAPANESE_PUNCTUATION)}]|[^\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF\sA-Za-z0-9]')
+SYLLABLE_PUNCTUATION_REGEX = re.compile(r'[、。！？,.!?]')
+
+# Kana nhỏ ghép với kana đứng trước thành một mora (きゃ, ファ...)
+SMALL_KANA = frozenset('ゃゅょぁぃぅぇぉゎャュョァィゥェォヮ')
+# Kana không được tính là âm tiết riêng khi đếm âm tiết
+NON_SYLLABIC_KANA = frozenset('ゃゅょッっァィゥェォぁぃぅぇぉ')
+# ん không phải một âm tiết riêng nếu nó đứng trước các hàng n, m, p, b
+N_ASSIMILATING_KANA = frozenset('なにぬねのまみむめもぱぴぷぺぽばびぶべぼ')
+
+
+class KanaText(NamedTuple):
+    text: str
+    hiragana: str
+    tokens: Tuple[str, ...]
+    token_hiragana: Tuple[str, ...]
+    # (start, end) of each token's reading within ``hiragana``
+    token_spans: Tuple[Tuple[int, int], ...]
+    morae: Tuple[str, ...]
+    syllables: int
+
+    def token_at(self, position: int) -> Optional[int]:
+        """Index of the token whose reading covers ``position`` in ``hiragana``, or None (punctuation)."""
+        # Spans are sorted and disjoint, so bisecting on (position, inf) finds the last span starting at or before it
+        k = bisect_right(self.token_spans, (position, math.inf)) - 1
+        if k >= 0 and position < self.token_spans[k][1]:
+            return k
+        return None
+
+
+def split_morae(kana: str) -> List[str]:
+    """Split kana into morae: small kana attach to the preceding character, whitespace is dropped."""
+    morae: List[str] = []
+    for char in kana:
+        if char.isspace():
+            continue
+        if char in SMALL_KANA and morae:
+            morae[-1] += char
+        else:
+            morae.append(char)
+    return morae
+
+
+def syllable_count(hiragana: str) -> int:
+    """Count syllables in hiragana with the scoring rules used by ``count_syllables``."""
+    syllables = 0
+    skip_next = False
+    for i, char in enumerate(hiragana):
+        if skip_next:
+            skip_next = False
+            continue
+        if char in NON_SYLLABIC_KANA:
+            continue
+        if char == 'ん' and i < len(hiragana) - 1 and hiragana[i + 1] in N_ASSIMILATING_KANA:
+            skip_next = True
+        syllables += 1
+    return syllables
+
+
+class KanaConverter:
+    """pykakasi wrapper memoizing ``analyze`` per text in an LRU cache of ``maxsize`` entries.
+
+    Pinned analyses (e.g. from the sentence catalog) are served before the LRU
+    and never evicted.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self._kakasi = pykakasi.kakasi()
+        self._lock = threading.Lock()
+        self._cached_analyze = lru_cache(maxsize=max(1, maxsize))(self._analyze)
+        self._pinned: Dict[str, KanaText] = {}
+        self.pinned_hits = 0
+
+    def analyze(self, text: str) -> KanaText:
+        pinned = self._pinned.get(text)
+        if pinned is not None:
+            self.pinned_hits += 1
+            return pinned
+        return self._cached_analyze(text)
+
+    def pin(self, analyses: Iterable[KanaText]) -> None:
+        """Serve these precomputed analyses without conversion for the life of the process."""
+        self._pinned.update((analysis.text, analysis) for analysis in analyses)
+
+    def _analyze(self, text: str) -> KanaText:
+        with self._lock:
+            items = self._kakasi.convert(text)
+
+        tokens, token_hiragana, token_spans = [], [], []
+        position = 0
+        for item in items:
+            hira = item.get('hira', '')
+            # Punctuation is split into its own items, so cleaning per item
+            # yields the same tokens as converting the cleaned text
+            token = CLEAN_REGEX.sub('', item.get('orig', ''))
+            if token.strip():
+                tokens.append(token)
+                token_hiragana.append(CLEAN_REGEX.sub('', hira))
+                token_spans.append((position, position + len(hira)))
+            position += len(hira)
+        hiragana = ''.join(item['hira'] for item in items if 'hira' in item)
+
+        return KanaText(
+            text=text,
+            hiragana=hiragana,
+            tokens=tuple(tokens),
+            token_hiragana=tuple(token_hiragana),
+            token_spans=tuple(token_spans),
+            morae=tuple(split_morae(''.join(token_hiragana))),
+            syllables=syllable_count(SYLLABLE_PUNCTUATION_REGEX.sub('', hiragana)),
+        )
+
+    def clear(self) -> None:
+        self._cached_analyze.cache_clear()
+
+    def stats(self) -> Dict[str, Any]:
+        info = self._cached_analyze.cache_info()
+        return {
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "pinned": len(self._pinned),
+            "pinned_hits": self.pinned_hits,
+        }
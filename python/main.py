@@ -2,8 +2,8 @@ import os
 import json
 import logging
 import traceback
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, FileResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from openai import OpenAI
@@ -13,21 +13,143 @@ import aubio
 import numpy as np
 from scipy.spatial.distance import euclidean
 from fastdtw import fastdtw
-from string import punctuation
 import soundfile as sf
-import tempfile
 from dotenv import load_dotenv
-import pykakasi
 import re
-from typing import Optional, Dict, List, Any, Union
+import time
+import asyncio
+import copy
+from contextlib import nullcontext
+from contextvars import ContextVar
+import unicodedata
+from typing import Optional, Dict, List, Any, Tuple, Union
+
+import audio_features
+from caches import SqliteStore, TTLCache, audio_fingerprint, content_key, shared_call
+from sample_cache import SampleFeatureCache
+from feature_index import load_feature_index
+from pitch_trackers import PITCH_TRACKERS
+from audio_io import TARGET_SR, AudioDecodeError, FFmpegTranscoder, TranscoderBusyError, decode_audio
+from dsp_executor import DSPExecutor, DSPQueueFullError
+from openai_client import AsyncOpenAIPool
+from alignment import ALIGNMENT_MODES, align
+from text_similarity import cache_stats as text_similarity_stats, levenshtein_distance, normalized_similarity
+from kana import CLEAN_REGEX, SYLLABLE_PUNCTUATION_REGEX, KanaConverter, KanaText
+from sentence_catalog import (SAMPLE_SENTENCES, SentenceCatalog, build_sentence_catalog, catalog_sentences,
+                              load_sentence_catalog)
+from phonetic_confusions import DEFAULT_CONFUSIONS_PATH, load_confusion_table
+from streaming import AudioStream, StreamLimitError
+from jobs import JobError, JobQueue, JobQueueFullError, report_progress
+from batch import BatchError, BatchItem, build_items, parse_manifest, read_uploads, read_zip, run_batch
+from asr_backends import ASR_BACKENDS, ASRBackend, LocalWhisperBackend, OpenAIWhisperBackend
+import metrics
+from metrics import stage
+from profiling import PROFILE_MODES, RequestProfile
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Debug mode (set to True for detailed error responses)
 DEBUG_MODE = os.getenv("DEBUG_MODE", "False").lower() in ("true", "1", "t")
+# Per-request profiling: "X-Profile: timings" header adds a stage timing breakdown to the response;
+# "cprofile" (or the ?profile= query flag) is only honored in DEBUG_MODE and writes dumps here
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
+# DSP process pool (pitch tracking and formants run outside the event loop)
+DSP_POOL_SIZE = int(os.getenv("DSP_POOL_SIZE", str(os.cpu_count() or 1)))
+DSP_TASK_TIMEOUT = float(os.getenv("DSP_TASK_TIMEOUT", "30"))
+DSP_MAX_QUEUE = int(os.getenv("DSP_MAX_QUEUE", str(4 * DSP_POOL_SIZE)))
+DSP_POOL_START_METHOD = os.getenv("DSP_POOL_START_METHOD", "spawn")
+
+# ffmpeg transcoding of browser uploads (webm/opus, mp3...)
+FFMPEG_MAX_CONCURRENCY = int(os.getenv("FFMPEG_MAX_CONCURRENCY", str(os.cpu_count() or 1)))
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "20"))
+FFMPEG_MAX_QUEUE = int(os.getenv("FFMPEG_MAX_QUEUE", str(4 * FFMPEG_MAX_CONCURRENCY)))
+
+# OpenAI connection pool (Whisper + chat completions)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+OPENAI_WHISPER_TIMEOUT = float(os.getenv("OPENAI_WHISPER_TIMEOUT", "60"))
+OPENAI_CHAT_TIMEOUT = float(os.getenv("OPENAI_CHAT_TIMEOUT", "30"))
+
+# LLM response cache (LLM_CACHE_PATH enables a persistent SQLite backing store)
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+# Speech recognition backend: "openai" (whisper-1 API) or "local" (faster-whisper on CPU)
+ASR_BACKEND = os.getenv("ASR_BACKEND", "openai")
+if ASR_BACKEND not in ASR_BACKENDS:
+    raise ValueError(f"Invalid ASR_BACKEND '{ASR_BACKEND}', expected one of: {', '.join(ASR_BACKENDS)}")
+LOCAL_ASR_MODEL = os.getenv("LOCAL_ASR_MODEL", "small")
+LOCAL_ASR_COMPUTE_TYPE = os.getenv("LOCAL_ASR_COMPUTE_TYPE", "int8")
+LOCAL_ASR_THREADS = int(os.getenv("LOCAL_ASR_THREADS", "0"))
+LOCAL_ASR_BEAM_SIZE = int(os.getenv("LOCAL_ASR_BEAM_SIZE", "1"))
+LOCAL_ASR_BATCH_SIZE = int(os.getenv("LOCAL_ASR_BATCH_SIZE", "8"))
+LOCAL_ASR_BATCH_WAIT_MS = float(os.getenv("LOCAL_ASR_BATCH_WAIT_MS", "20"))
+LOCAL_ASR_TIMEOUT = float(os.getenv("LOCAL_ASR_TIMEOUT", "60"))
+# When ASR fails: use the reference sentence as transcription (flagged in the response) or return 502
+ASR_FALLBACK_TO_REFERENCE = os.getenv("ASR_FALLBACK_TO_REFERENCE", "True").lower() in ("true", "1", "t")
+
+# Phoneme alignment: "lcs" (matches/omissions/additions) or "weighted" (phonetic substitution costs)
+ALIGNMENT_MODE = os.getenv("ALIGNMENT_MODE", "lcs")
+if ALIGNMENT_MODE not in ALIGNMENT_MODES:
+    raise ValueError(f"Invalid ALIGNMENT_MODE '{ALIGNMENT_MODE}', expected one of: {', '.join(ALIGNMENT_MODES)}")
+
+# Kana conversion cache (one pykakasi pass per distinct text)
+KANA_CACHE_SIZE = int(os.getenv("KANA_CACHE_SIZE", "4096"))
+# Lesson sentence catalog built by build_sentence_catalog.py (otherwise built from LESSON_DATA_SQL at startup)
+SENTENCE_CATALOG_PATH = os.getenv("SENTENCE_CATALOG_PATH", "sentence_catalog.json")
+LESSON_DATA_SQL = os.getenv("LESSON_DATA_SQL", "../ddl/02-init-data.sql")
+# Bảng phân loại lỗi nhầm lẫn ngữ âm (có thể mở rộng mà không sửa code)
+PHONETIC_CONFUSIONS_PATH = os.getenv("PHONETIC_CONFUSIONS_PATH", DEFAULT_CONFUSIONS_PATH)
+
+# Whisper transcription cache keyed by decoded PCM (TRANSCRIPTION_CACHE_PATH enables SQLite persistence)
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv("TRANSCRIPTION_CACHE_SIZE", "1024"))
+TRANSCRIPTION_CACHE_TTL = float(os.getenv("TRANSCRIPTION_CACHE_TTL", str(24 * 3600)))
+TRANSCRIPTION_CACHE_PATH = os.getenv("TRANSCRIPTION_CACHE_PATH", "")
+
+# Cache toàn bộ kết quả phân tích theo (PCM đã giải mã, câu mẫu, sample, cấu hình chấm điểm)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 3600)))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")
+# Tăng khi thay đổi công thức chấm điểm để bỏ qua kết quả đã cache
+RESULT_CACHE_VERSION = 3
+
+# Default pitch tracker (pyin, praat, yin); can be overridden per request
+PITCH_TRACKER = os.getenv("PITCH_TRACKER", "pyin")
+if PITCH_TRACKER not in PITCH_TRACKERS:
+    raise ValueError(f"Invalid PITCH_TRACKER '{PITCH_TRACKER}', expected one of: {', '.join(PITCH_TRACKERS)}")
+
+# WebSocket streaming analysis: partial energy/pitch/voicing while the learner is still speaking
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "32"))
+STREAM_MAX_SECONDS = float(os.getenv("STREAM_MAX_SECONDS", "60"))
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "30"))
+STREAM_PARTIAL_INTERVAL_MS = float(os.getenv("STREAM_PARTIAL_INTERVAL_MS", "200"))
+# Pitch is tracked incrementally with aubio YIN; with another tracker it is recomputed when the stream ends
+STREAM_PITCH_TRACKER = os.getenv("STREAM_PITCH_TRACKER", "yin")
+if STREAM_PITCH_TRACKER not in PITCH_TRACKERS:
+    raise ValueError(f"Invalid STREAM_PITCH_TRACKER '{STREAM_PITCH_TRACKER}', expected one of: {', '.join(PITCH_TRACKERS)}")
+
+# Batch analysis (multipart files or zip archive, results streamed as NDJSON)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", str(DSP_POOL_SIZE)))
+BATCH_MAX_MB = float(os.getenv("BATCH_MAX_MB", "200"))
+
+# Asynchronous job mode (submit, then poll or subscribe via SSE); JOB_STORE_DIR keeps the queue on disk
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(DSP_POOL_SIZE)))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_STORE_DIR = os.getenv("JOB_STORE_DIR", "")
+JOB_EVENTS_HEARTBEAT = float(os.getenv("JOB_EVENTS_HEARTBEAT", "15"))
+
+# Reference samples and their feature cache
+SAMPLES_DIR = os.getenv("SAMPLES_DIR", "../nihongo-it-backend/src/main/resources/samples")
+SAMPLE_CACHE_MAX_MB = float(os.getenv("SAMPLE_CACHE_MAX_MB", "256"))
+# Precomputed index built by precompute_samples.py (memory-mapped at startup)
+FEATURE_INDEX_DIR = os.getenv("FEATURE_INDEX_DIR", "sample_features_index")
+
 app = FastAPI()
 
 # Enable CORS
@@ -45,15 +167,234 @@ app.add_middleware(
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Khởi tạo Open AI API key
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Khởi tạo Open AI client dùng chung connection pool
+# Không có API key với ASR local: chạy offline, phân tích LLM dùng kết quả mô phỏng
+openai_pool: Optional[AsyncOpenAIPool] = None
+if OPENAI_API_KEY or ASR_BACKEND == "openai":
+    openai_pool = AsyncOpenAIPool(
+        api_key=OPENAI_API_KEY or None,
+        max_concurrency=OPENAI_MAX_CONCURRENCY,
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive=OPENAI_MAX_CONCURRENCY,
+        whisper_timeout=OPENAI_WHISPER_TIMEOUT,
+        chat_timeout=OPENAI_CHAT_TIMEOUT
+    )
+
+# Cache kết quả phân tích LLM theo nội dung (câu gốc, transcription, lỗi phoneme)
+llm_cache = TTLCache(
+    maxsize=LLM_CACHE_SIZE,
+    ttl=LLM_CACHE_TTL,
+    store=SqliteStore(LLM_CACHE_PATH, ttl=LLM_CACHE_TTL) if LLM_CACHE_PATH else None,
+    name="llm"
+)
+
+# Backend nhận dạng giọng nói
+asr_backend: ASRBackend
+if ASR_BACKEND == "local":
+    asr_backend = LocalWhisperBackend(
+        model_size=LOCAL_ASR_MODEL,
+        compute_type=LOCAL_ASR_COMPUTE_TYPE,
+        cpu_threads=LOCAL_ASR_THREADS,
+        beam_size=LOCAL_ASR_BEAM_SIZE,
+        max_batch_size=LOCAL_ASR_BATCH_SIZE,
+        max_batch_wait=LOCAL_ASR_BATCH_WAIT_MS / 1000.0,
+        timeout=LOCAL_ASR_TIMEOUT
+    )
+else:
+    asr_backend = OpenAIWhisperBackend(openai_pool, model="whisper-1")
+
+# Cache kết quả nhận dạng theo dấu vân tay PCM đã giải mã và ngôn ngữ
+transcription_cache = TTLCache(
+    maxsize=TRANSCRIPTION_CACHE_SIZE,
+    ttl=TRANSCRIPTION_CACHE_TTL,
+    store=SqliteStore(TRANSCRIPTION_CACHE_PATH, ttl=TRANSCRIPTION_CACHE_TTL) if TRANSCRIPTION_CACHE_PATH else None,
+    name="transcription"
+)
+transcriptions_inflight: Dict[str, asyncio.Task] = {}
 
-# Khởi tạo pykakasi cho tokenization tiếng Nhật
-kakasi = pykakasi.kakasi()
+result_cache = TTLCache(
+    maxsize=RESULT_CACHE_SIZE,
+    ttl=RESULT_CACHE_TTL,
+    store=SqliteStore(RESULT_CACHE_PATH, ttl=RESULT_CACHE_TTL) if RESULT_CACHE_PATH else None,
+    name="result"
+)
+results_inflight: Dict[str, asyncio.Task] = {}
+
+# Khởi tạo pykakasi cho tokenization tiếng Nhật (kết quả được cache theo câu)
+kana = KanaConverter(maxsize=KANA_CACHE_SIZE)
+sentence_catalog: Optional[SentenceCatalog] = None
+phonetic_confusions = load_confusion_table(PHONETIC_CONFUSIONS_PATH)
+
+# Khởi tạo process pool cho các bước phân tích DSP
+dsp_executor = DSPExecutor(
+    max_workers=DSP_POOL_SIZE,
+    task_timeout=DSP_TASK_TIMEOUT,
+    max_queue=DSP_MAX_QUEUE,
+    start_method=DSP_POOL_START_METHOD
+)
 
-# Regex để loại bỏ dấu câu và ký tự đặc biệt tiếng Nhật
-JAPANESE_PUNCTUATION = '、。！？；：「」『』・〜'
-CLEAN_REGEX = re.compile(f'[{re.escape(punctuation + JAPANESE_PUNCTUATION)}]|[^\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FFF\sA-Za-z0-9]')
+# Hàng đợi job phân tích bất đồng bộ (handler được định nghĩa cùng các endpoint)
+job_queue = JobQueue(
+    handler=lambda job, payload: run_analysis_job(job, payload),
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    ttl=JOB_RESULT_TTL,
+    store_dir=JOB_STORE_DIR or None
+)
+
+# Số phiên phân tích streaming qua WebSocket
+stream_stats = {"active": 0, "completed": 0, "failed": 0, "rejected": 0, "disconnected": 0}
+
+# Chuyển mã ffmpeg bất đồng bộ, giới hạn số tiến trình chạy song song
+transcoder = FFmpegTranscoder(
+    max_concurrency=FFMPEG_MAX_CONCURRENCY,
+    timeout=FFMPEG_TIMEOUT,
+    max_queue=FFMPEG_MAX_QUEUE
+)
+
+# Prometheus metrics (/metrics); latency per pipeline stage comes from metrics.stage()
+http_requests_in_flight = metrics.REGISTRY.gauge(
+    "nihongo_http_requests_in_flight", "HTTP requests currently being handled")
+http_requests_total = metrics.REGISTRY.counter(
+    "nihongo_http_requests_total", "Handled HTTP requests", ("endpoint", "method", "status"))
+http_request_seconds = metrics.REGISTRY.histogram(
+    "nihongo_http_request_duration_seconds", "Time until the response starts", ("endpoint",))
+fallbacks_total = metrics.REGISTRY.counter(
+    "nihongo_fallbacks_total", "Degraded results (transcription: ASR failed, reference text used; "
+    "llm: canned feedback; dsp_stage/formant/sample_features: DSP work failed; scoring: default scores)", ("kind",))
+# Fallbacks hit while computing the current analysis; set by cached_analysis so degraded results are not cached
+analysis_fallbacks: ContextVar[Optional[List[str]]] = ContextVar("analysis_fallbacks", default=None)
+
+def record_fallback(kind: str) -> None:
+    """Count a degraded step and mark the analysis it belongs to as degraded."""
+    fallbacks_total.inc(kind=kind)
+    fallbacks = analysis_fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append(kind)
+
+def cache_metrics(key: str):
+    """Collector of one counter from the stats() of every cache, labelled by cache name."""
+    def collect():
+        caches = {
+            "llm": llm_cache.stats(),
+            "transcription": transcription_cache.stats(),
+            "result": result_cache.stats(),
+            "sample": sample_cache.stats(),
+            "kana": kana.stats(),
+            "text_similarity": text_similarity_stats(),
+        }
+        return [((name,), stats[key]) for name, stats in caches.items()]
+    return collect
+
+metrics.REGISTRY.collector("nihongo_cache_hits_total", "Cache hits", "counter", ("cache",), cache_metrics("hits"))
+metrics.REGISTRY.collector("nihongo_cache_misses_total", "Cache misses", "counter", ("cache",), cache_metrics("misses"))
+metrics.REGISTRY.collector(
+    "nihongo_inflight", "Work currently running or waiting, per component", "gauge", ("component", "state"),
+    lambda: [
+        (("dsp", "pending"), dsp_executor.stats()["pending"]),
+        (("ffmpeg", "running"), transcoder.running),
+        (("ffmpeg", "pending"), transcoder.stats()["pending"]),
+        (("openai", "running"), openai_pool.stats()["in_flight"] if openai_pool is not None else 0),
+        (("transcription", "running"), len(transcriptions_inflight)),
+        (("analysis", "running"), len(results_inflight)),
+        (("jobs", "running"), job_queue.running),
+        (("jobs", "pending"), job_queue.pending),
+        (("streams", "running"), stream_stats["active"]),
+    ])
+metrics.REGISTRY.collector(
+    "nihongo_stream_sessions_total", "Finished WebSocket streaming sessions", "counter", ("outcome",),
+    lambda: [((outcome,), count) for outcome, count in stream_stats.items() if outcome != "active"])
+metrics.REGISTRY.collector(
+    "nihongo_jobs_total", "Finished asynchronous analysis jobs", "counter", ("status",),
+    lambda: [(("done",), job_queue.completed), (("failed",), job_queue.failed)])
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    http_requests_in_flight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        # The router stores the matched endpoint in the scope; unmatched paths would explode label cardinality
+        endpoint = getattr(request.scope.get("endpoint"), "__name__", "unmatched")
+        http_request_seconds.observe(time.perf_counter() - start, endpoint=endpoint)
+        http_requests_total.inc(endpoint=endpoint, method=request.method, status=str(status))
+
+@app.on_event("startup")
+async def start_dsp_pool():
+    dsp_executor.start(warmup=audio_features.warmup)
+
+@app.on_event("shutdown")
+async def stop_dsp_pool():
+    dsp_executor.shutdown()
+
+@app.on_event("shutdown")
+async def close_openai_pool():
+    if openai_pool is not None:
+        await openai_pool.aclose()
+
+@app.on_event("startup")
+async def start_asr_backend():
+    await asr_backend.start()
+
+@app.on_event("shutdown")
+async def stop_asr_backend():
+    await asr_backend.aclose()
+
+async def compute_sample_features(path: str, sr: int, tracker: str) -> Dict[str, Any]:
+    return await dsp_executor.run(audio_features.load_sample_features, path, sr, tracker)
+
+# Cache đặc trưng của âm thanh mẫu (chỉ tính lại khi file thay đổi)
+sample_cache = SampleFeatureCache(
+    samples_dir=SAMPLES_DIR,
+    max_bytes=int(SAMPLE_CACHE_MAX_MB * 1024 * 1024),
+    compute=compute_sample_features
+)
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+@app.on_event("startup")
+async def load_sample_index():
+    sample_cache.index = load_feature_index(FEATURE_INDEX_DIR)
+
+@app.on_event("startup")
+async def load_lesson_sentences():
+    global sentence_catalog
+    catalog = load_sentence_catalog(SENTENCE_CATALOG_PATH)
+    if catalog is None:
+        catalog = await asyncio.to_thread(build_sentence_catalog, catalog_sentences(LESSON_DATA_SQL), kana)
+        logger.info(f"Built sentence catalog with {len(catalog)} sentences")
+    kana.pin(catalog.analyses())
+    sentence_catalog = catalog
+
+def reference_sentence(sentence_id: str) -> Optional[str]:
+    """Reference text for a sample or lesson sentence ID."""
+    if sentence_catalog is not None:
+        text = sentence_catalog.text_for_id(sentence_id)
+        if text is not None:
+            return text
+    return SAMPLE_SENTENCES.get(sentence_id)
+
+async def run_dsp_stage(name: str, fn, *args) -> Any:
+    """Run a DSP stage in the process pool; a failing stage returns None, a full queue propagates."""
+    try:
+        return await dsp_executor.run(fn, *args)
+    except DSPQueueFullError:
+        raise
+    except Exception as e:
+        logger.error(f"Error in DSP stage '{name}': {str(e)}")
+        record_fallback("dsp_stage")
+        return None
 
 # Flag for Kaldi availability (will be simulated since not installed)
 KALDI_AVAILABLE = False
@@ -64,52 +405,26 @@ async def count_syllables(text: str) -> int:
     if not text or not text.strip():
         return 0
         
-    # Loại bỏ dấu câu
-    text = re.sub(r'[、。！？,.!?]', '', text)
-    
     try:
-        # Chuyển sang hiragana
-        hira_text = await to_hiragana(text)
-        logger.info(f"Hiragana for syllable counting: {hira_text}")
-        
-        # Quy tắc đếm âm tiết trong tiếng Nhật:
+        # Chuyển sang hiragana (đã cache) và đếm âm tiết:
         # 1. Mỗi kana (hiragana/katakana) là một âm tiết
         # 2. Trừ các kí tự đặc biệt (ゃ, ゅ, ょ, っ) không được tính riêng
         # 3. Các chữ kanji được tính dựa trên cách đọc (đã được chuyển sang hiragana)
-        special_chars = {'ゃ', 'ゅ', 'ょ', 'ッ', 'っ', 'ァ', 'ィ', 'ゥ', 'ェ', 'ォ', 'ぁ', 'ぃ', 'ぅ', 'ぇ', 'ぉ'}
-        
-        # Đếm số âm tiết
-        syllables = 0
-        skip_next = False
-        for i, char in enumerate(hira_text):
-            if skip_next:
-                skip_next = False
-                continue
-                
-            if char in special_chars:
-                continue
-                
-            # Kiểm tra nếu kí tự hiện tại là n (ん) cuối câu hoặc trước phụ âm (không phải y, w)
-            if char == 'ん' and i < len(hira_text) - 1:
-                next_char = hira_text[i+1]
-                # ん không phải một âm tiết riêng nếu nó đứng trước các phụ âm thuộc nhóm n, m, p, b (na, ma, pa, ba...)
-                if next_char in {'な', 'に', 'ぬ', 'ね', 'の', 'ま', 'み', 'む', 'め', 'も', 'ぱ', 'ぴ', 'ぷ', 'ぺ', 'ぽ', 'ば', 'び', 'ぶ', 'べ', 'ぼ'}:
-                    skip_next = True
-                    
-            syllables += 1
-            
-        logger.info(f"Counted {syllables} syllables in: {text}")
-        return max(1, syllables)  # Ensure at least 1 syllable
+        # 4. ん đứng trước hàng n, m, p, b gộp với âm tiết tiếp theo
+        analysis = kana.analyze(text)
+        logger.info(f"Hiragana for syllable counting: {SYLLABLE_PUNCTUATION_REGEX.sub('', analysis.hiragana)}")
+        logger.info(f"Counted {analysis.syllables} syllables in: {text}")
+        return max(1, analysis.syllables)  # Ensure at least 1 syllable
     except Exception as e:
         logger.error(f"Error counting syllables: {str(e)}")
         # Fallback: rough estimate based on character count
+        text = SYLLABLE_PUNCTUATION_REGEX.sub('', text)
         return max(1, len(text.strip()) // 3)
 
 async def to_hiragana(text: str) -> str:
     """Convert text to hiragana for normalization."""
     try:
-        result = kakasi.convert(text)
-        return ''.join(item['hira'] for item in result if 'hira' in item)
+        return kana.analyze(text).hiragana
     except Exception as e:
         logger.error(f"Error converting to hiragana: {str(e)}")
         return text
@@ -124,19 +439,124 @@ async def tokenize_japanese(text: str) -> List[str]:
     if not cleaned_text:
         return []
     
-    result = kakasi.convert(cleaned_text)
-    words = []
-    
-    for item in result:
-        if 'orig' in item and item['orig'].strip():
-            words.append(item['orig'])
+    words = list(kana.analyze(text).tokens)
     
     logger.info(f"Tokenized '{text}' into {len(words)} words: {words}")
     return words
 
+async def token_hiragana_map(text: str) -> Dict[str, str]:
+    """Map each word of ``text`` to its hiragana reading (from the same cached kakasi pass as the tokens)."""
+    if not await clean_text(text):
+        return {}
+    analysis = kana.analyze(text)
+    return dict(zip(analysis.tokens, analysis.token_hiragana))
+
+def kana_key(text: str) -> str:
+    """Hiragana reading of ``text`` without punctuation or spaces, used for text scoring."""
+    return ''.join(kana.analyze(text).morae)
+
+async def transcribe_audio(y: np.ndarray, sr: int, language: str = "ja") -> str:
+    """Transcribe decoded audio with the configured ASR backend, reusing results for identical PCM.
+
+    Concurrent requests for the same audio share one backend call, which keeps running if any of
+    them is cancelled; errors are not cached.
+    """
+    cache_key = content_key(audio_fingerprint(y, sr), language, asr_backend.name)
+    cached = await transcription_cache.aget(cache_key)
+    if cached is not None:
+        logger.info("Transcription served from cache")
+        return cached
+
+    if cache_key in transcriptions_inflight:
+        logger.info("Waiting for in-flight transcription of identical audio")
+
+    async def transcribe() -> str:
+        with stage("whisper"):
+            text = await asr_backend.transcribe(y, sr, language=language)
+        await transcription_cache.aset(cache_key, text)
+        return text
+
+    return await shared_call(transcriptions_inflight, cache_key, transcribe)
+
+def result_cache_key(kind: str, y: np.ndarray, sr: int, reference_text: str,
+                     sample_id: Optional[str], pitch_tracker: Optional[str]) -> str:
+    """Key of a full analysis response: decoded audio, reference, sample and everything that changes scoring.
+
+    The sample audio mtime (as tracked by the sample feature cache) and the
+    confusion table fingerprint are included so that replacing samples/<id>.wav
+    or editing the rule file invalidates results.
+    """
+    sample_mtime = sample_cache.sample_mtime(sample_id) if sample_id else None
+    return content_key(RESULT_CACHE_VERSION, kind, audio_fingerprint(y, sr), reference_text, sample_id or None,
+                       sample_mtime, pitch_tracker or PITCH_TRACKER, ALIGNMENT_MODE, asr_backend.name,
+                       ASR_FALLBACK_TO_REFERENCE, phonetic_confusions.fingerprint)
+
+async def cached_analysis(cache_key: str, analyze) -> Dict[str, Any]:
+    """Return the cached response for ``cache_key`` or run ``analyze()`` once, sharing it with concurrent duplicates.
+
+    Degraded results (any ``record_fallback`` during ``analyze()``: reference text
+    instead of ASR, canned LLM feedback, failed DSP stages or sample features)
+    are not cached, so a retry is analyzed again once the failing part recovers.
+    """
+    with stage("result_cache"):
+        cached = await result_cache.aget(cache_key)
+    if cached is not None:
+        logger.info("Analysis result served from cache")
+        return dict(cached)
+
+    if cache_key in results_inflight:
+        logger.info("Waiting for in-flight analysis of identical request")
+
+    async def analyze_and_store() -> Dict[str, Any]:
+        # Own task, own context: collects only the fallbacks of this analysis
+        fallbacks: List[str] = []
+        analysis_fallbacks.set(fallbacks)
+        result = await analyze()
+        if fallbacks:
+            logger.info(f"Not caching degraded analysis result (fallbacks: {', '.join(sorted(set(fallbacks)))})")
+        else:
+            await result_cache.aset(cache_key, result)
+        return result
+
+    # Runs in its own task: a cancelled caller (e.g. a disconnected batch) leaves the others waiting
+    return dict(await shared_call(results_inflight, cache_key, analyze_and_store))
+
+async def transcribe_with_fallback(y: np.ndarray, sr: int, reference_text: str,
+                                   language: str = "ja") -> Tuple[str, bool]:
+    """Return ``(transcription, used_fallback)``.
+
+    On ASR failure the reference sentence stands in for the transcription when
+    ASR_FALLBACK_TO_REFERENCE is enabled; otherwise the request fails with 502.
+    """
+    try:
+        logger.info(f"Transcribing audio with ASR backend '{asr_backend.name}'")
+        transcription = await transcribe_audio(y, sr, language=language)
+        logger.info(f"Transcription successful: {transcription}")
+        return transcription, False
+    except Exception as e:
+        logger.error(f"Error during transcription ({asr_backend.name}): {str(e)}")
+        if not ASR_FALLBACK_TO_REFERENCE:
+            raise HTTPException(status_code=502, detail="Speech recognition failed")
+        logger.warning(f"Using reference text as fallback transcription: {reference_text}")
+        record_fallback("transcription")
+        return reference_text, True
+
+def llm_cache_key(original: str, transcription: str, phoneme_errors: Optional[List[Dict[str, str]]]) -> str:
+    """Content-addressed key over the normalized sentence pair and the set of phoneme errors."""
+    def normalize(text: str) -> str:
+        return CLEAN_REGEX.sub('', unicodedata.normalize("NFKC", text or "")).strip()
+    
+    error_set = None
+    if phoneme_errors is not None:
+        error_set = sorted({
+            (e.get("error_type", ""), e.get("expected", ""), e.get("actual", ""), e.get("phonetic_error", ""))
+            for e in phoneme_errors
+        })
+    return content_key(normalize(original), normalize(transcription), error_set)
+
 async def analyze_with_llm(original: str, transcription: str, phoneme_errors: List[Dict[str, str]] = None) -> Dict[str, Any]:
     """Use LLM to analyze semantic differences and identify auxiliary words with phoneme error details."""
-    if not OPENAI_API_KEY:
+    if not OPENAI_API_KEY or openai_pool is None:
         logger.warning("OpenAI API key not set, using simulated LLM analysis")
         return {
             "incorrect_words": [],
@@ -144,6 +564,12 @@ async def analyze_with_llm(original: str, transcription: str, phoneme_errors: Li
             "personalized_feedback": "Cần cải thiện phát âm của một số từ. Hãy luyện tập thêm nhé!"
         }
     
+    cache_key = llm_cache_key(original, transcription, phoneme_errors)
+    cached = await llm_cache.aget(cache_key)
+    if cached is not None:
+        logger.info("LLM analysis served from cache")
+        return copy.deepcopy(cached)
+    
     try:
         # Prepare phoneme error information for LLM
         phoneme_info = ""
@@ -177,12 +603,13 @@ Return ONLY a JSON object with this structure:
 }}
 """
         # Call OpenAI API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Can use gpt-4 for better results if available
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=500
-        )
+        with stage("llm"):
+            response = await openai_pool.chat(
+                model="gpt-3.5-turbo",  # Can use gpt-4 for better results if available
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=500
+            )
         
         content = response.choices[0].message.content.strip()
         # Extract JSON from the response (handle potential text wrapping)
@@ -190,13 +617,16 @@ Return ONLY a JSON object with this structure:
         if json_content:
             result = json.loads(json_content.group(1))
             logger.info(f"LLM analysis successful with phoneme details")
+            await llm_cache.aset(cache_key, copy.deepcopy(result))
             return result
         else:
             logger.error(f"Failed to extract JSON from LLM response: {content}")
+            record_fallback("llm")
             return {"incorrect_words": [], "auxiliary_words": [], "personalized_feedback": ""}
             
     except Exception as e:
         logger.error(f"Error in LLM analysis: {str(e)}")
+        record_fallback("llm")
         return {
             "incorrect_words": [],
             "auxiliary_words": ["ね", "よ", "な", "わ", "さ"],
@@ -205,14 +635,10 @@ Return ONLY a JSON object with this structure:
 
 async def get_expected_phonemes(text: str) -> List[str]:
     """Get expected phonemes from text (simulated using hiragana)."""
-    result = kakasi.convert(text)
-    phonemes = []
-    for item in result:
-        hira = item['hira']
-        phonemes.extend(list(hira))  # Each hiragana character is treated as a phoneme (simplified)
-    return phonemes
-
-async def simulate_phoneme_analysis(audio_path: str, original_text: str, transcription: str) -> List[Dict[str, str]]:
+    # Each hiragana character is treated as a phoneme (simplified)
+    return list(kana.analyze(text).hiragana)
+
+async def simulate_phoneme_analysis(audio_path: Optional[str], original_text: str, transcription: str) -> List[Dict[str, str]]:
     """Simulate phoneme analysis based on transcription and original text with improved phonetic awareness."""
     logger.info(f"Enhanced phoneme analysis for original: '{original_text}', transcription: '{transcription}'")
     
@@ -225,55 +651,24 @@ async def simulate_phoneme_analysis(audio_path: str, original_text: str, transcr
     
     phoneme_errors = []
     
-    # Thực hiện so sánh theo chuỗi phoneme với các đặc điểm ngữ âm
-    # Sử dụng giải thuật Longest Common Subsequence (LCS) để căn chỉnh
-    m, n = len(orig_hira), len(trans_hira)
-    
-    # Tạo ma trận LCS
-    lcs = [[0 for _ in range(n+1)] for _ in range(m+1)]
-    for i in range(1, m+1):
-        for j in range(1, n+1):
-            if orig_hira[i-1] == trans_hira[j-1]:
-                lcs[i][j] = lcs[i-1][j-1] + 1
-            else:
-                lcs[i][j] = max(lcs[i-1][j], lcs[i][j-1])
-    
-    # Lấy chuỗi căn chỉnh từ ma trận LCS
-    i, j = m, n
-    alignment = []
-    
-    while i > 0 and j > 0:
-        if orig_hira[i-1] == trans_hira[j-1]:
-            alignment.append((i-1, j-1, orig_hira[i-1], trans_hira[j-1], True))  # Match
-            i -= 1
-            j -= 1
-        elif lcs[i-1][j] >= lcs[i][j-1]:
-            alignment.append((i-1, None, orig_hira[i-1], None, False))  # Deletion
-            i -= 1
-        else:
-            alignment.append((None, j-1, None, trans_hira[j-1], False))  # Insertion
-            j -= 1
-            
-    # Xử lý phần đầu còn lại
-    while i > 0:
-        alignment.append((i-1, None, orig_hira[i-1], None, False))
-        i -= 1
-        
-    while j > 0:
-        alignment.append((None, j-1, None, trans_hira[j-1], False))
-        j -= 1
-        
-    # Đảo ngược alignment để có thứ tự từ đầu đến cuối
-    alignment.reverse()
+    # Căn chỉnh chuỗi phoneme (LCS bit-parallel, hoặc edit distance có trọng số ngữ âm)
+    with stage("alignment"):
+        alignment = align(orig_hira, trans_hira, ALIGNMENT_MODE)
     
     # Tạo danh sách các lỗi phoneme
+    # "position" là vị trí trong hiragana của câu gốc (phoneme thừa gắn với vị trí chèn)
+    last_position = max(len(orig_hira) - 1, 0)
+    consumed = 0
     for idx, (orig_idx, trans_idx, orig_ph, trans_ph, is_match) in enumerate(alignment):
+        if orig_idx is not None:
+            consumed = orig_idx + 1
         if not is_match:
             # Xác định loại lỗi
             if orig_ph is None:
                 # Thêm phoneme (trong transcription mà không có trong bản gốc)
                 phoneme_errors.append({
                     "index": idx,
+                    "position": min(consumed, last_position),
                     "expected": "none",
                     "actual": trans_ph,
                     "error_type": "addition"
@@ -282,140 +677,89 @@ async def simulate_phoneme_analysis(audio_path: str, original_text: str, transcr
                 # Thiếu phoneme (trong bản gốc nhưng không có trong transcription)
                 phoneme_errors.append({
                     "index": idx,
+                    "position": orig_idx,
                     "expected": orig_ph,
                     "actual": "missing",
                     "error_type": "omission"
                 })
             else:
                 # Thay thế phoneme (khác nhau giữa bản gốc và transcription)
+                category, message = phonetic_confusions.classify(orig_ph, trans_ph)
                 phoneme_errors.append({
                     "index": idx,
+                    "position": orig_idx,
                     "expected": orig_ph,
                     "actual": trans_ph,
                     "error_type": "substitution",
                     # Phân loại cặp nhầm lẫn phoneme dựa trên các đặc điểm ngữ âm
-                    "phonetic_error": categorize_phonetic_error(orig_ph, trans_ph)
+                    "phonetic_category": category,
+                    "phonetic_error": message
                 })
     
     return phoneme_errors
 
 def categorize_phonetic_error(expected: str, actual: str) -> str:
-    """Phân loại lỗi phoneme dựa trên đặc điểm ngữ âm."""
-    # Các nhóm phoneme tiếng Nhật dễ nhầm lẫn
-    similar_groups = {
-        "vowel_confusion": [
-            {"a": "あ", "i": "い", "u": "う", "e": "え", "o": "お"},
-        ],
-        "consonant_pairs": [
-            {"k-g": ["か", "が"], "s-z": ["さ", "ざ"], "t-d": ["た", "だ"], "h-b": ["は", "ば"], "h-p": ["は", "ぱ"]},
-        ],
-        "small_ya_yu_yo": [
-            {"ya": "ゃ", "yu": "ゅ", "yo": "ょ"},
-        ],
-        "long_short_vowel": [
-            {"a": "あ", "aa": "ああ"}, {"i": "い", "ii": "いい"}, 
-            {"u": "う", "uu": "うう"}, {"e": "え", "ee": "ええ"}, 
-            {"o": "お", "oo": "おお"},
-        ],
-        "n_confusion": [
-            {"n": "ん"},
-        ],
-        "tsu_confusion": [
-            {"tsu": "つ", "small_tsu": "っ"},
-        ]
-    }
-    
-    # Xác định lỗi dựa trên so sánh phoneme
-    if expected == "し" and actual == "す" or expected == "す" and actual == "し":
-        return "Nhầm lẫn giữa 'shi' và 'su'"
-    elif expected in "しゃしゅしょ" and actual in "しゃしゅしょ" and expected != actual:
-        return f"Nhầm lẫn trong nhóm 'sha/shu/sho': '{expected}' và '{actual}'"
-    elif expected in "ちゃちゅちょ" and actual in "ちゃちゅちょ" and expected != actual:
-        return f"Nhầm lẫn trong nhóm 'cha/chu/cho': '{expected}' và '{actual}'"
-    elif expected in "じゃじゅじょ" and actual in "じゃじゅじょ" and expected != actual:
-        return f"Nhầm lẫn trong nhóm 'ja/ju/jo': '{expected}' và '{actual}'"
-    elif expected == "つ" and actual == "す" or expected == "す" and actual == "つ":
-        return "Nhầm lẫn giữa 'tsu' và 'su'"
-    elif expected == "ふ" and actual == "は" or expected == "は" and actual == "ふ":
-        return "Nhầm lẫn giữa 'fu' và 'ha'"
-    elif expected == "お" and actual == "を" or expected == "を" and actual == "お":
-        return "Nhầm lẫn giữa 'o' và 'wo'"
-    elif expected == "へ" and actual == "え" or expected == "え" and actual == "へ":
-        return "Nhầm lẫn giữa 'he' và 'e'"
-    elif "ゃ" in expected and "ゃ" not in actual:
-        return "Thiếu âm 'ya' nhỏ (ゃ)"
-    elif "ゅ" in expected and "ゅ" not in actual:
-        return "Thiếu âm 'yu' nhỏ (ゅ)"
-    elif "ょ" in expected and "ょ" not in actual:
-        return "Thiếu âm 'yo' nhỏ (ょ)"
-    elif "っ" in expected and "っ" not in actual:
-        return "Thiếu âm 'tsu' nhỏ (っ)"
-    elif "ん" in expected and "ん" not in actual:
-        return "Thiếu âm 'n' (ん)"
-    else:
-        return f"Phát âm sai: Mong muốn '{expected}', đã phát âm '{actual}'"
+    """Phân loại lỗi phoneme dựa trên bảng nhầm lẫn ngữ âm (data/phonetic_confusions.json)."""
+    return phonetic_confusions.classify(expected, actual)[1]
 
 async def combine_phoneme_errors_with_words(words: List[Dict], 
                                           phoneme_errors: List[Dict],
-                                          hiragana_map: Dict[str, str]) -> List[Dict]:
-    """Combine phoneme error information with word analysis results."""
+                                          reference: KanaText) -> List[Dict]:
+    """Combine phoneme error information with word analysis results.
+    
+    Errors are attributed through the reference sentence's token spans (bisect
+    over the cached ``KanaText``), so repeated words are handled independently.
+    """
     if not phoneme_errors:
         return words
     
-    # Build phoneme to word mapping
-    word_phoneme_map = {}
-    current_pos = 0
-    
-    for word, hira in hiragana_map.items():
-        word_phoneme_map[word] = {
-            "start": current_pos,
-            "end": current_pos + len(hira) - 1,
-            "hiragana": hira
-        }
-        current_pos += len(hira)
+    # Reference tokens appear in ``words`` in order; extra transcription words are skipped
+    token_words: List[Optional[Dict]] = [None] * len(reference.tokens)
+    next_token = 0
+    for word in words:
+        if next_token < len(reference.tokens) and word["text"] == reference.tokens[next_token]:
+            token_words[next_token] = word
+            next_token += 1
     
     # Process each phoneme error and associate with words
     for error in phoneme_errors:
-        idx = error.get("index", -1)
-        if idx < 0:
+        position = error.get("position")
+        if position is None or position < 0:
             continue
             
         # Find which word contains this phoneme position
-        for word in words:
-            word_text = word["text"]
-            if word_text not in word_phoneme_map:
-                continue
-                
-            word_range = word_phoneme_map[word_text]
-            if word_range["start"] <= idx <= word_range["end"]:
-                # This word contains the phoneme error
-                error_details = ""
-                
-                # Get specific error details based on error type
-                if "error_type" in error and "phonetic_error" in error:
-                    error_details = error["phonetic_error"]
-                else:
-                    expected = error.get("expected", "?")
-                    actual = error.get("actual", "?")
-                    if actual == "missing":
-                        error_details = f"Thiếu âm '{expected}'"
-                    elif expected == "none":
-                        error_details = f"Thêm âm thừa '{actual}'"
-                    else:
-                        error_details = f"Phát âm '{expected}' thành '{actual}'"
-                
-                # Enhance suggestion with phoneme error info
-                base_suggestion = word.get("suggestion", "")
-                if base_suggestion:
-                    if error_details not in base_suggestion:  # Avoid duplication
-                        word["suggestion"] = f"{error_details}. {base_suggestion}"
-                else:
-                    word["suggestion"] = f"{error_details}. Hãy luyện tập phát âm '{word_text}' chuẩn hơn."
-                
-                # Mark as incorrect
-                word["isCorrect"] = False
-                break
-    
+        token = reference.token_at(position)
+        if token is None or token_words[token] is None:
+            continue
+        word = token_words[token]
+        word_text = word["text"]
+        
+        error_details = ""
+        
+        # Get specific error details based on error type
+        if "error_type" in error and "phonetic_error" in error:
+            error_details = error["phonetic_error"]
+        else:
+            expected = error.get("expected", "?")
+            actual = error.get("actual", "?")
+            if actual == "missing":
+                error_details = f"Thiếu âm '{expected}'"
+            elif expected == "none":
+                error_details = f"Thêm âm thừa '{actual}'"
+            else:
+                error_details = f"Phát âm '{expected}' thành '{actual}'"
+        
+        # Enhance suggestion with phoneme error info
+        base_suggestion = word.get("suggestion", "")
+        if base_suggestion:
+            if error_details not in base_suggestion:  # Avoid duplication
+                word["suggestion"] = f"{error_details}. {base_suggestion}"
+        else:
+            word["suggestion"] = f"{error_details}. Hãy luyện tập phát âm '{word_text}' chuẩn hơn."
+        
+        # Mark as incorrect
+        word["isCorrect"] = False
+
     return words
 
 async def generate_personalized_feedback(words: List[Dict], 
@@ -447,13 +791,8 @@ async def compare_words(original: str, transcription: str) -> List[Dict]:
     orig_words = await tokenize_japanese(original)
     trans_words = await tokenize_japanese(transcription)
     
-    orig_hiragana = {}
-    for word in orig_words:
-        orig_hiragana[word] = await to_hiragana(word)
-    
-    trans_hiragana = {}
-    for word in trans_words:
-        trans_hiragana[word] = await to_hiragana(word)
+    orig_hiragana = await token_hiragana_map(original)
+    trans_hiragana = await token_hiragana_map(transcription)
     
     logger.info(f"Original words: {orig_words}")
     logger.info(f"Transcription words: {trans_words}")
@@ -477,25 +816,25 @@ async def compare_words(original: str, transcription: str) -> List[Dict]:
     
     return result_words
 
-async def compare_words_enhanced(original: str, transcription: str) -> tuple:
-    """Enhanced word comparison using hiragana normalization."""
+async def compare_words_enhanced(original: str, transcription: str,
+                                 llm_analysis: Optional[Dict[str, Any]] = None) -> tuple:
+    """Enhanced word comparison using hiragana normalization.
+    
+    Pass ``llm_analysis`` to reuse an LLM result already computed for this sentence pair.
+    """
     logger.info(f"Enhanced comparison between original: '{original}' and transcription: '{transcription}'")
     
     orig_words = await tokenize_japanese(original)
     trans_words = await tokenize_japanese(transcription)
     
-    orig_hiragana = {}
-    for word in orig_words:
-        orig_hiragana[word] = await to_hiragana(word)
-    
-    trans_hiragana = {}
-    for word in trans_words:
-        trans_hiragana[word] = await to_hiragana(word)
+    orig_hiragana = await token_hiragana_map(original)
+    trans_hiragana = await token_hiragana_map(transcription)
     
     logger.info(f"Original words with hiragana: {orig_hiragana}")
     logger.info(f"Transcription words with hiragana: {trans_hiragana}")
     
-    llm_analysis = await analyze_with_llm(original, transcription)
+    if llm_analysis is None:
+        llm_analysis = await analyze_with_llm(original, transcription)
     auxiliary_words = set(llm_analysis.get("auxiliary_words", []))
     incorrect_map = {item["word"]: item for item in llm_analysis.get("incorrect_words", [])}
     
@@ -580,10 +919,23 @@ async def compare_words_enhanced(original: str, transcription: str) -> tuple:
     
     return result_words, orig_hiragana, llm_analysis
 
-async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
-    """Analyze audio features and return basic analysis results with improved scoring."""
+async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription,
+                                 sample_features: Optional[Dict[str, Any]] = None,
+                                 pitch_tracker: Optional[str] = None,
+                                 user_features: Optional[Dict[str, Any]] = None):
+    """Analyze audio features and return basic analysis results with improved scoring.
+    
+    Reference features can be passed precomputed as ``sample_features`` (see
+    ``audio_features.sample_features``); otherwise they are extracted from ``sample_y``.
+    ``pitch_tracker`` selects the F0 backend (defaults to PITCH_TRACKER).
+    ``user_features`` may carry user stages computed ahead of time (e.g. while
+    streaming): ``pitch_contour`` (voiced F0 from ``pitch_tracker`` or None)
+    and ``formant_tracks``.
+    """
+    pitch_tracker = pitch_tracker or PITCH_TRACKER
+    user_features = user_features or {}
     try:
-        # Phân tích pitch với Librosa
+        # Phân tích pitch (một lần duy nhất với pitch tracker đã chọn)
         logger.info("Analyzing pitch...")
         
         # Check audio energy first to validate audio quality
@@ -595,89 +947,64 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
         intonation_score = 0
         intonation = "Không thể phân tích ngữ điệu"
         pitch_mean = 0
+        user_pitch_contour = None
+        sample_pitch_contour = None
         user_pitch_data = []
         sample_pitch_data = []
         
+        if sample_features is None and sample_y is not None and len(sample_y) > 0:
+            with stage("sample_features"):
+                sample_features = await run_dsp_stage("sample features", audio_features.sample_features, sample_y, sr, pitch_tracker)
+        sample_stats = sample_features["stats"] if sample_features is not None else None
+        
         # Check if audio has enough energy to analyze
         if audio_rms < 0.01:
             logger.warning(f"Audio energy too low for pitch analysis: RMS={audio_rms:.6f}")
             intonation = "Không thể phân tích ngữ điệu (âm thanh quá yếu)"
         else:
-            # Extract pitch values from audio using librosa
-            pitches, magnitudes = librosa.piptrack(y=user_y, sr=sr)
-            pitch_values = [p for p, m in zip(pitches.T, magnitudes.T) if m.max() > 0]
+            # Single pitch stage in the DSP pool: the voiced F0 contour feeds the
+            # mean/std/range statistics, the scoring and the visualization data
+            if "pitch_contour" in user_features:
+                user_f0 = user_features["pitch_contour"]
+            else:
+                with stage("pitch"):
+                    user_f0 = await run_dsp_stage(f"pitch ({pitch_tracker})", audio_features.pitch_contour, user_y, sr, pitch_tracker)
             
             # Only analyze if we have extracted pitch values
-            if len(pitch_values) > 0:
-                pitch_mean = np.mean(pitch_values)
-                pitch_std = np.std(pitch_values)
-                logger.info(f"Extracted {len(pitch_values)} pitch points, mean={pitch_mean:.2f}Hz, std={pitch_std:.2f}Hz")
+            if user_f0 is not None:
+                pitch_mean = float(np.mean(user_f0))
+                pitch_std = float(np.std(user_f0))
+                pitch_range = float(np.ptp(user_f0))
+                logger.info(f"Extracted {len(user_f0)} pitch points, mean={pitch_mean:.2f}Hz, std={pitch_std:.2f}Hz")
                 
                 # Analyze pitch contour for more detailed intonation information
-                user_pitch_contour = None
-                sample_pitch_contour = None
+                user_pitch_contour = user_f0
                 
-                try:
-                    # Extract pitch contour (F0) using more precise method
-                    if len(user_y) > 0:
-                        user_hop_length = 256
-                        user_f0, voiced_flag, voiced_probs = librosa.pyin(
-                            user_y, 
-                            fmin=librosa.note_to_hz('C2'), 
-                            fmax=librosa.note_to_hz('C7'),
-                            sr=sr,
-                            hop_length=user_hop_length
-                        )
-                        # Filter out NaN values and check we have valid data
-                        valid_indices = ~np.isnan(user_f0) & voiced_flag
-                        if np.any(valid_indices):
-                            user_pitch_contour = user_f0[valid_indices]
-                            logger.info(f"User pitch contour extracted: {len(user_pitch_contour)} points")
-                            
-                            # Only continue if we have enough pitch points
-                            if len(user_pitch_contour) < 5:
-                                logger.warning(f"Too few pitch points detected: {len(user_pitch_contour)}")
-                                user_pitch_contour = None
-                        else:
-                            logger.warning("No valid pitch points detected in audio")
-                            
-                    # Extract pitch contour from sample if available
-                    if sample_y is not None and len(sample_y) > 0:
-                        sample_hop_length = 256
-                        sample_f0, sample_voiced_flag, sample_voiced_probs = librosa.pyin(
-                            sample_y, 
-                            fmin=librosa.note_to_hz('C2'), 
-                            fmax=librosa.note_to_hz('C7'),
-                            sr=sr,
-                            hop_length=sample_hop_length
-                        )
-                        
-                        # Filter out NaN values and check we have valid data
-                        valid_sample_indices = ~np.isnan(sample_f0) & sample_voiced_flag
-                        if np.any(valid_sample_indices):
-                            sample_pitch_contour = sample_f0[valid_sample_indices]
-                            
-                            # Log sample pitch statistics
-                            sample_pitch_mean = np.mean(sample_pitch_contour) if len(sample_pitch_contour) > 0 else 0
-                            sample_pitch_std = np.std(sample_pitch_contour) if len(sample_pitch_contour) > 0 else 0
-                            logger.info(f"Sample pitch contour extracted: {len(sample_pitch_contour)} points, mean={sample_pitch_mean:.2f}Hz, std={sample_pitch_std:.2f}Hz")
-                except Exception as e:
-                    logger.error(f"Error extracting pitch contours: {str(e)}")
+                # Only continue if we have enough pitch points
+                if len(user_pitch_contour) < 5:
+                    logger.warning(f"Too few pitch points detected: {len(user_pitch_contour)}")
+                    user_pitch_contour = None
+                    
+                if sample_features is not None and len(sample_features["pitch_contour"]) > 0:
+                    sample_pitch_contour = sample_features["pitch_contour"]
+                    
+                    # Log sample pitch statistics
+                    logger.info(f"Sample pitch contour: {len(sample_pitch_contour)} points, mean={sample_stats['pitch_mean']:.2f}Hz, std={sample_stats['pitch_std']:.2f}Hz")
                     
                 # Calculate intonation score based on comparison with sample or sensible defaults
                 if (sample_pitch_contour is not None and len(sample_pitch_contour) > 10 and 
                     user_pitch_contour is not None and len(user_pitch_contour) > 10):
                     logger.info("Using sample comparison for intonation analysis")
                     
-                    # Calculate sample statistics
-                    sample_pitch_mean = np.mean(sample_pitch_contour)
-                    sample_pitch_std = np.std(sample_pitch_contour)
-                    sample_pitch_range = np.ptp(sample_pitch_contour)
+                    # Sample statistics are precomputed with the sample features
+                    sample_pitch_mean = sample_stats["pitch_mean"]
+                    sample_pitch_std = sample_stats["pitch_std"]
+                    sample_pitch_range = sample_stats["pitch_range"]
                     
-                    # Calculate user statistics
-                    user_pitch_mean = np.mean(user_pitch_contour)
-                    user_pitch_std = np.std(user_pitch_contour)
-                    user_pitch_range = np.ptp(user_pitch_contour)
+                    # User statistics come from the same contour
+                    user_pitch_mean = pitch_mean
+                    user_pitch_std = pitch_std
+                    user_pitch_range = pitch_range
                     
                     # Check if user pitch is realistic - should be between 50-500Hz for human voice
                     if 50 <= user_pitch_mean <= 500:
@@ -765,26 +1092,23 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
         # Phân tích formant với Parselmouth
         logger.info("Analyzing formants...")
         try:
-            snd = parselmouth.Sound(np.array(user_y), sr)
-            formants = snd.to_formant_burg()
-            f1_values = [formants.get_value_at_time(1, t) for t in formants.ts() if not np.isnan(formants.get_value_at_time(1, t))]
+            # One bulk Burg analysis returns whole F1/F2/F3 tracks (NaN where undefined)
+            formant_tracks = user_features.get("formant_tracks")
+            if formant_tracks is None:
+                with stage("formant"):
+                    formant_tracks = await dsp_executor.run(audio_features.formant_tracks, user_y, sr)
+            f1_values = audio_features.defined_values(formant_tracks["f1"]).tolist()
+            f2_values = audio_features.defined_values(formant_tracks["f2"])
             f1_mean = np.mean(f1_values) if f1_values else 500
+            f2_mean = float(np.mean(f2_values)) if len(f2_values) > 0 else None
             
-            # Get sample formants if sample audio is available
+            # Get sample formants if sample features are available
             sample_f1_mean = None
             sample_f1_values = []
-            if sample_y is not None and len(sample_y) > 0:
-                try:
-                    sample_snd = parselmouth.Sound(np.array(sample_y), sr)
-                    sample_formants = sample_snd.to_formant_burg()
-                    sample_f1_values = [sample_formants.get_value_at_time(1, t) for t in sample_formants.ts() 
-                                       if not np.isnan(sample_formants.get_value_at_time(1, t))]
-                    sample_f1_mean = np.mean(sample_f1_values) if sample_f1_values else None
-                    logger.info(f"Sample F1 mean: {sample_f1_mean:.2f}Hz")
-                except Exception as e:
-                    logger.error(f"Error analyzing sample formants: {str(e)}")
-                    sample_f1_mean = None
-                    sample_f1_values = []
+            if sample_stats is not None and sample_stats["f1_mean"] is not None:
+                sample_f1_mean = sample_stats["f1_mean"]
+                sample_f1_values = sample_features["f1_values"].tolist()
+                logger.info(f"Sample F1 mean: {sample_f1_mean:.2f}Hz")
             
             # Calculate clarity score based on sample if available
             if sample_f1_mean is not None and sample_f1_mean > 0:
@@ -830,9 +1154,13 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             # Ensure score is within valid range
             clarity_score = max(0, min(100, clarity_score))
             
+        except DSPQueueFullError:
+            raise
         except Exception as e:
             logger.error(f"Error in formant analysis: {str(e)}")
+            record_fallback("formant")
             f1_mean = 500
+            f2_mean = None
             clarity_score = 50
             f1_values = []
             sample_f1_values = []
@@ -871,38 +1199,30 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
                 text_score = 0
                 has_text_match = False
             else:
-                # Clean texts for comparison
-                transcription_clean = await clean_text(transcription)
-                original_clean = await clean_text(sentence)
+                # So sánh trên chuỗi kana đã chuẩn hóa bằng khoảng cách chỉnh sửa (Levenshtein)
+                with stage("text_scoring"):
+                    transcription_kana = kana_key(transcription)
+                    original_kana = kana_key(sentence)
+                    if original_kana and transcription_kana:
+                        distance = levenshtein_distance(original_kana, transcription_kana)
+                        text_similarity = normalized_similarity(original_kana, transcription_kana)
                 
-                logger.info(f"Comparing cleaned texts: '{original_clean}' vs '{transcription_clean}'")
+                logger.info(f"Comparing kana texts: '{original_kana}' vs '{transcription_kana}'")
                 
-                if len(original_clean) > 0 and len(transcription_clean) > 0:
-                    # Calculate similarity using character-by-character comparison
-                    common_length = min(len(transcription_clean), len(original_clean))
-                    matches = sum(a == b for a, b in zip(transcription_clean[:common_length], original_clean[:common_length]))
-                    
-                    # Calculate additional penalty for length difference
-                    length_diff = abs(len(transcription_clean) - len(original_clean))
-                    max_length = max(len(transcription_clean), len(original_clean))
+                if original_kana and transcription_kana:
+                    max_length = max(len(original_kana), len(transcription_kana))
+                    text_score = int(text_similarity * 100)
+                    has_text_match = text_score > 0
                     
-                    # Calculate final similarity score with length penalty
-                    if max_length > 0:
-                        text_similarity = (matches / max_length) * (1 - 0.5 * (length_diff / max_length))
-                        text_score = int(text_similarity * 100)
-                        has_text_match = text_score > 0
-                    else:
-                        text_score = 0
-                        has_text_match = False
-                    
-                    logger.info(f"Text similarity analysis: matches={matches}/{max_length}, length_diff={length_diff}, score={text_score}%")
+                    logger.info(f"Text similarity analysis: edit distance={distance}/{max_length}, score={text_score}%")
                 else:
-                    logger.warning("One or both cleaned texts are empty")
+                    logger.warning("One or both normalized texts are empty")
                     text_score = 0
                     has_text_match = False
                 
         except Exception as e:
             logger.error(f"Error comparing text: {str(e)}")
+            record_fallback("scoring")
             text_score = 0
             has_text_match = False
         
@@ -963,6 +1283,7 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             
         except Exception as e:
             logger.error(f"Error calculating score: {str(e)}")
+            record_fallback("scoring")
             score = 0
             feedback = "Không thể tính điểm - hãy thử lại."
 
@@ -982,6 +1303,7 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             # Add raw measurements for reference
             "pitchMean": round(float(pitch_mean), 2),
             "f1Mean": round(float(f1_mean), 2),
+            "f2Mean": round(f2_mean, 2) if f2_mean is not None else None,
             # Include formula weights for frontend display
             "formulaWeights": {
                 "withoutAudio": {
@@ -990,16 +1312,20 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
                     "clarity": 0.15
                 }
             },
-            "userPitchData": [],
+            "userPitchData": user_pitch_data,
             "samplePitchData": sample_pitch_data,
             # Add formant data for visualization
-            "userFormantData": [],
+            "userFormantData": f1_values if f1_values and len(f1_values) > 0 else [],
             "sampleFormantData": sample_f1_values if sample_f1_values and len(sample_f1_values) > 0 else []
         }
 
+    except DSPQueueFullError:
+        raise
     except Exception as e:
         logger.error(f"Error in formant analysis: {str(e)}")
+        record_fallback("formant")
         f1_mean = 500
+        f2_mean = None
         clarity_score = 50
         f1_values = []
         sample_f1_values = []
@@ -1038,38 +1364,30 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
                 text_score = 0
                 has_text_match = False
             else:
-                # Clean texts for comparison
-                transcription_clean = await clean_text(transcription)
-                original_clean = await clean_text(sentence)
+                # So sánh trên chuỗi kana đã chuẩn hóa bằng khoảng cách chỉnh sửa (Levenshtein)
+                with stage("text_scoring"):
+                    transcription_kana = kana_key(transcription)
+                    original_kana = kana_key(sentence)
+                    if original_kana and transcription_kana:
+                        distance = levenshtein_distance(original_kana, transcription_kana)
+                        text_similarity = normalized_similarity(original_kana, transcription_kana)
                 
-                logger.info(f"Comparing cleaned texts: '{original_clean}' vs '{transcription_clean}'")
+                logger.info(f"Comparing kana texts: '{original_kana}' vs '{transcription_kana}'")
                 
-                if len(original_clean) > 0 and len(transcription_clean) > 0:
-                    # Calculate similarity using character-by-character comparison
-                    common_length = min(len(transcription_clean), len(original_clean))
-                    matches = sum(a == b for a, b in zip(transcription_clean[:common_length], original_clean[:common_length]))
-                    
-                    # Calculate additional penalty for length difference
-                    length_diff = abs(len(transcription_clean) - len(original_clean))
-                    max_length = max(len(transcription_clean), len(original_clean))
-                    
-                    # Calculate final similarity score with length penalty
-                    if max_length > 0:
-                        text_similarity = (matches / max_length) * (1 - 0.5 * (length_diff / max_length))
-                        text_score = int(text_similarity * 100)
-                        has_text_match = text_score > 0
-                    else:
-                        text_score = 0
-                        has_text_match = False
+                if original_kana and transcription_kana:
+                    max_length = max(len(original_kana), len(transcription_kana))
+                    text_score = int(text_similarity * 100)
+                    has_text_match = text_score > 0
                     
-                    logger.info(f"Text similarity analysis: matches={matches}/{max_length}, length_diff={length_diff}, score={text_score}%")
+                    logger.info(f"Text similarity analysis: edit distance={distance}/{max_length}, score={text_score}%")
                 else:
-                    logger.warning("One or both cleaned texts are empty")
+                    logger.warning("One or both normalized texts are empty")
                     text_score = 0
                     has_text_match = False
                 
         except Exception as e:
             logger.error(f"Error comparing text: {str(e)}")
+            record_fallback("scoring")
             text_score = 0
             has_text_match = False
         
@@ -1130,6 +1448,7 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             
         except Exception as e:
             logger.error(f"Error calculating score: {str(e)}")
+            record_fallback("scoring")
             score = 0
             feedback = "Không thể tính điểm - hãy thử lại."
 
@@ -1149,6 +1468,7 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             # Add raw measurements for reference
             "pitchMean": round(float(pitch_mean), 2),
             "f1Mean": round(float(f1_mean), 2),
+            "f2Mean": round(f2_mean, 2) if f2_mean is not None else None,
             # Include formula weights for frontend display
             "formulaWeights": {
                 "withoutAudio": {
@@ -1164,236 +1484,219 @@ async def analyze_audio_features(user_y, sr, sample_y, sentence, transcription):
             "sampleFormantData": sample_f1_values if sample_f1_values and len(sample_f1_values) > 0 else []
         }
 
+async def load_sample_features(sample_id: Optional[str], sr: int,
+                               pitch_tracker: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Reference features of ``sample_id`` from the sample cache, or None when unavailable."""
+    if not sample_id:
+        return None
+    try:
+        with stage("sample_features"):
+            return await sample_cache.get(sample_id, sr, pitch_tracker or PITCH_TRACKER)
+    except DSPQueueFullError:
+        raise
+    except Exception as e:
+        logger.error(f"Error loading sample features: {str(e)}")
+        record_fallback("sample_features")
+        return None
+
+async def score_enhanced_analysis(user_y, sr, reference_text: str, transcription: str, transcription_fallback: bool,
+                                  sample_features: Optional[Dict[str, Any]], pitch_tracker: Optional[str] = None,
+                                  user_features: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Feature scoring, phoneme analysis, LLM feedback and word comparison of a transcribed recording."""
+    report_progress("acoustic_analysis")
+    result = await analyze_audio_features(user_y, sr, None, reference_text, transcription,
+                                          sample_features=sample_features,
+                                          pitch_tracker=pitch_tracker,
+                                          user_features=user_features)
+    
+    report_progress("phoneme_analysis")
+    phoneme_errors = await simulate_phoneme_analysis(None, reference_text, transcription)
+    logger.info(f"Found {len(phoneme_errors)} phoneme errors")
+    
+    report_progress("llm_analysis")
+    llm_result = await analyze_with_llm(reference_text, transcription, phoneme_errors)
+    
+    report_progress("feedback")
+    words, _, _ = await compare_words_enhanced(reference_text, transcription, llm_result)
+    
+    enhanced_words = await combine_phoneme_errors_with_words(words, phoneme_errors, kana.analyze(reference_text))
+    
+    personalized_feedback = await generate_personalized_feedback(
+        enhanced_words, reference_text, transcription, llm_result)
+    
+    result["words"] = enhanced_words
+    result["personalizedFeedback"] = personalized_feedback
+    result["transcriptionFallback"] = transcription_fallback
+    return result
+
 async def analyze_audio_enhanced(user_audio: UploadFile, 
                             sample_id: str = Form(None),
-                            reference_text: str = Form(None)):
+                            reference_text: str = Form(None),
+                            pitch_tracker: Optional[str] = None):
     """Enhanced audio analysis with LLM, hiragana normalization, and phoneme analysis."""
+    with stage("upload_read"):
+        user_content = await user_audio.read()
+    return await analyze_enhanced_content(user_content, sample_id, reference_text, pitch_tracker)
+
+async def analyze_enhanced_content(user_content: bytes,
+                                   sample_id: Optional[str] = None,
+                                   reference_text: Optional[str] = None,
+                                   pitch_tracker: Optional[str] = None) -> Dict[str, Any]:
+    """Enhanced analysis of one uploaded recording (raw file bytes)."""
     
     logger.info(f"Enhanced analysis request with reference text: '{reference_text}', sample_id: '{sample_id}'")
     
-    user_audio_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as user_temp:
-            user_content = await user_audio.read()
-            user_temp.write(user_content)
-            user_audio_path = user_temp.name
-            user_audio.file.seek(0)
-            
-        logger.info(f"Created temporary audio file: {user_audio_path}")
-        
-        sample_audio_path = None
-        if sample_id:
-            sample_path = f"../nihongo-it-backend/src/main/resources/samples/{sample_id}.wav"
-            if os.path.exists(sample_path):
-                logger.info(f"Found sample audio: {sample_path}")
-                sample_audio_path = sample_path
-            else:
-                logger.warning(f"Sample audio not found: {sample_path}")
-                sample_audio_path = None
-                
+        if not reference_text and sample_id and reference_sentence(sample_id):
+            reference_text = reference_sentence(sample_id)
+            logger.info(f"Using catalog reference text for sample '{sample_id}': '{reference_text}'")
         if not reference_text:
             logger.warning("No reference text provided, will use empty string")
             reference_text = ""
             
+        logger.info("Decoding user audio...")
+        report_progress("decoding")
         try:
-            logger.info(f"Trying to transcribe audio with Whisper API from: {user_audio_path}")
-            with open(user_audio_path, "rb") as audio_file:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ja"
-                )
-                transcription = response.text
-                logger.info(f"Transcription successful: {transcription}")
+            user_y = await decode_audio(user_content, TARGET_SR, transcoder)
+            sr = TARGET_SR
+            logger.info(f"Decoded audio with sr={sr}, length={len(user_y)}")
+        except TranscoderBusyError as e:
+            logger.warning(f"Rejecting request: {str(e)}")
+            raise HTTPException(status_code=503, detail="Audio transcoder is busy, please retry later")
         except Exception as e:
-            logger.error(f"Error during Whisper transcription: {str(e)}")
-            transcription = reference_text
-            logger.info(f"Using fallback transcription: {transcription}")
-
-        logger.info("Loading user audio...")
-        try:
-            user_y, sr = librosa.load(user_audio_path, sr=16000)
-            logger.info(f"Loaded audio with sr={sr}, length={len(user_y)}")
-        except Exception as e:
-            logger.error(f"Error loading audio with librosa: {str(e)}")
+            logger.error(f"Error decoding audio: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Cannot read audio file: {str(e)}")
             
-        sample_y = None
-        if sample_audio_path and os.path.exists(sample_audio_path):
-            try:
-                sample_y, _ = librosa.load(sample_audio_path, sr=sr)
-                logger.info(f"Loaded sample audio with length={len(sample_y)}")
-            except Exception as e:
-                logger.error(f"Error loading sample audio: {str(e)}")
-                sample_y = None
+        async def analyze() -> Dict[str, Any]:
+            report_progress("transcription")
+            transcription, transcription_fallback = await transcribe_with_fallback(user_y, sr, reference_text)
                 
-        result = await analyze_audio_features(user_y, sr, sample_y, reference_text, transcription)
-            
-        orig_words = await tokenize_japanese(reference_text)
-        hiragana_map = {}
-        for word in orig_words:
-            hiragana_map[word] = await to_hiragana(word)
-        
-        phoneme_errors = await simulate_phoneme_analysis(user_audio_path, reference_text, transcription)
-        logger.info(f"Found {len(phoneme_errors)} phoneme errors")
-        
-        llm_result = await analyze_with_llm(reference_text, transcription, phoneme_errors)
-        
-        words, _, _ = await compare_words_enhanced(reference_text, transcription)
-        
-        enhanced_words = await combine_phoneme_errors_with_words(words, phoneme_errors, hiragana_map)
-        
-        personalized_feedback = await generate_personalized_feedback(
-            enhanced_words, reference_text, transcription, llm_result)
-        
-        result["words"] = enhanced_words
-        result["personalizedFeedback"] = personalized_feedback
+            report_progress("sample_features")
+            sample_features = await load_sample_features(sample_id, sr, pitch_tracker)
+                    
+            return await score_enhanced_analysis(user_y, sr, reference_text, transcription, transcription_fallback,
+                                                 sample_features, pitch_tracker)
         
-        if user_audio_path and os.path.exists(user_audio_path):
-            os.unlink(user_audio_path)
-            
-        return result
+        cache_key = result_cache_key("enhanced", user_y, sr, reference_text, sample_id, pitch_tracker)
+        return await cached_analysis(cache_key, analyze)
+    except HTTPException:
+        raise
+    except DSPQueueFullError as e:
+        logger.warning(f"Rejecting enhanced analysis, DSP pool saturated: {str(e)}")
+        raise HTTPException(status_code=503, detail="Analysis server is busy, please retry later")
     except Exception as e:
         logger.error(f"Error in enhanced analysis: {str(e)}")
         logger.error(traceback.format_exc())
-        
-        if user_audio_path and os.path.exists(user_audio_path):
-            try:
-                os.unlink(user_audio_path)
-            except:
-                pass
-                
         raise HTTPException(status_code=500, detail=f"Enhanced analysis error: {str(e)}")
 
-async def analyze_audio(user_audio: UploadFile, sample_audio: UploadFile, sentence: str):
+async def analyze_audio(user_audio: UploadFile, sample_audio: UploadFile, sentence: str,
+                        pitch_tracker: Optional[str] = None):
     try:
         filename = user_audio.filename or "speech.webm"
         content_type = user_audio.content_type or "audio/webm"
         
-        try:
-            size = await user_audio.tell()
-        except (AttributeError, NotImplementedError):
-            user_audio_content = await user_audio.read()
-            size = len(user_audio_content)
-            user_audio.file.seek(0)
-        
-        logger.info(f"Received audio file: {filename}, content_type: {content_type}, size: {size}")
-        
-        file_extension = os.path.splitext(filename)[1].lower()
-        if not file_extension:
-            file_extension = ".webm"
-        
-        logger.info(f"File extension: {file_extension}")
+        with stage("upload_read"):
+            user_content = await user_audio.read()
+        logger.info(f"Received audio file: {filename}, content_type: {content_type}, size: {len(user_content)}")
         
-        suffix = file_extension if file_extension in ['.mp3', '.wav', '.webm'] else '.webm'
+        if not user_content:
+            logger.error("Empty audio file")
+            raise HTTPException(status_code=400, detail="File âm thanh rỗng")
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as user_temp:
-            user_content = await user_audio.read()
-            
-            if not user_content:
-                logger.error("Empty audio file")
-                raise HTTPException(status_code=400, detail="File âm thanh rỗng")
-                
-            logger.info(f"Audio content size: {len(user_content)} bytes")
-            user_temp.write(user_content)
-            user_audio_path = user_temp.name
-
-        user_wav_path = user_audio_path
-        if suffix != '.wav':
-            user_wav_path = user_audio_path.replace(suffix, '.wav')
-            try:
-                import subprocess
-                logger.info(f"Converting {user_audio_path} to {user_wav_path}")
-                
-                process = subprocess.run([
-                    "ffmpeg", "-y", "-i", user_audio_path, 
-                    "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-                    "-v", "info", user_wav_path
-                ], check=True, capture_output=True, text=True)
-                
-                logger.info(f"Conversion output: {process.stdout}")
-                if process.stderr:
-                    logger.info(f"Conversion errors: {process.stderr}")
-                    
-                if os.path.exists(user_wav_path):
-                    logger.info(f"Converted audio to WAV: {user_wav_path}, size: {os.path.getsize(user_wav_path)} bytes")
-                else:
-                    logger.error(f"Conversion failed, WAV file missing")
-                    raise Exception("Audio conversion failed")
-                    
-            except Exception as e:
-                logger.error(f"Error converting audio: {str(e)}")
-                user_wav_path = user_audio_path
-        else:
-            logger.info(f"Using WAV file directly, no conversion needed: {user_wav_path}")
-
-        sample_audio_path = ""
         if sample_audio and sample_audio.filename:
-            try:
-                sample_extension = os.path.splitext(sample_audio.filename)[1].lower()
-                sample_suffix = sample_extension if sample_extension in ['.mp3', '.wav', '.webm'] else '.wav'
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=sample_suffix) as sample_temp:
-                    sample_content = await sample_audio.read()
-                    sample_temp.write(sample_content)
-                    sample_audio_path = sample_temp.name
-                
-                logger.info(f"Sample audio saved to: {sample_audio_path}")
-            except Exception as e:
-                logger.error(f"Error processing sample audio: {str(e)}")
-                sample_audio_path = ""
+            # Âm thanh mẫu được tải lên chưa được dùng để chấm điểm
+            sample_content = await sample_audio.read()
+            logger.info(f"Received sample audio: {sample_audio.filename}, size: {len(sample_content)} (not used for scoring)")
 
+        # Giải mã âm thanh trong bộ nhớ (soundfile, hoặc ffmpeg bất đồng bộ qua pipe với webm/mp3)
+        logger.info("Giải mã âm thanh người dùng...")
         try:
-            logger.info(f"Trying to transcribe audio with Whisper API from: {user_wav_path}")
-            with open(user_wav_path, "rb") as audio_file:
-                response = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    language="ja"
-                )
-                transcription = response.text
-                logger.info(f"Transcription successful: {transcription}")
+            user_y = await decode_audio(user_content, TARGET_SR, transcoder)
+            sr = TARGET_SR
+            logger.info(f"Decoded audio with sr={sr}, length={len(user_y)}")
+        except TranscoderBusyError as e:
+            logger.warning(f"Rejecting request: {str(e)}")
+            raise HTTPException(status_code=503, detail="Bộ chuyển mã âm thanh đang quá tải, vui lòng thử lại sau")
         except Exception as e:
-            logger.error(f"Error during Whisper transcription: {str(e)}")
-            transcription = sentence
-            logger.info(f"Using fallback transcription: {transcription}")
+            logger.error(f"Error decoding audio: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Không thể đọc file âm thanh: {str(e)}")
 
-        words = await compare_words(sentence, transcription)
-        logger.info(f"Word comparison completed with {len(words)} words analyzed")
+        async def analyze() -> Dict[str, Any]:
+            transcription, transcription_fallback = await transcribe_with_fallback(user_y, sr, sentence)
 
-        logger.info("Tải âm thanh người dùng...")
-        try:
-            user_y, sr = librosa.load(user_wav_path, sr=16000)
-            logger.info(f"Loaded audio with sr={sr}, length={len(user_y)}")
-        except Exception as e:
-            logger.error(f"Error loading audio with librosa: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Không thể đọc file âm thanh: {str(e)}")
+            words = await compare_words(sentence, transcription)
+            logger.info(f"Word comparison completed with {len(words)} words analyzed")
 
-        result = await analyze_audio_features(user_y, sr, None, sentence, transcription)
-            
-        if user_wav_path and os.path.exists(user_wav_path):
-            os.unlink(user_wav_path)
+            result = await analyze_audio_features(user_y, sr, None, sentence, transcription,
+                                                  pitch_tracker=pitch_tracker)
+            result["transcriptionFallback"] = transcription_fallback
+            return result
+
+        result = await cached_analysis(result_cache_key("basic", user_y, sr, sentence, None, pitch_tracker), analyze)
 
         logger.info(f"Returning analysis result with score: {result.get('score', 'unknown')}")
         return result
 
+    except HTTPException:
+        raise
+    except DSPQueueFullError as e:
+        logger.warning(f"Từ chối phân tích, DSP pool quá tải: {str(e)}")
+        raise HTTPException(status_code=503, detail="Máy chủ phân tích đang quá tải, vui lòng thử lại sau")
     except Exception as e:
         logger.error(f"Lỗi phân tích âm thanh: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Lỗi phân tích âm thanh: {str(e)}")
 
+def requested_profile(request: Request, name: str) -> Optional[RequestProfile]:
+    """Profiling asked for by the client, following the DEBUG_MODE gating used for tracebacks.
+
+    The ``X-Profile`` header is always read; the ``profile`` query flag and
+    cProfile dumps (written to PROFILE_DIR) require DEBUG_MODE.
+    """
+    mode = request.headers.get("x-profile") or (request.query_params.get("profile") if DEBUG_MODE else None)
+    if not mode:
+        return None
+    mode = mode.strip().lower()
+    if mode in ("1", "true"):
+        mode = "timings"
+    if mode not in PROFILE_MODES:
+        return None
+    if mode == "cprofile" and not DEBUG_MODE:
+        mode = "timings"
+    return RequestProfile(name, mode, PROFILE_DIR)
+
 @app.post("/analyze", response_class=JSONResponse)
 async def analyze_endpoint(
+    request: Request,
     audio: UploadFile = File(...),
     sentence: str = Form(...),
-    sample: UploadFile = File(None)
+    sample: UploadFile = File(None),
+    pitch_tracker: str = Form(None)
 ):
     try:
         logger.info(f"Received basic analyze request with sentence: {sentence}")
         logger.info(f"Audio file: {audio.filename if audio else 'None'}, Sample file: {sample.filename if sample else 'None'}")
         
-        result = await analyze_audio(audio, sample, sentence)
+        if pitch_tracker and pitch_tracker not in PITCH_TRACKERS:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": f"Unknown pitch_tracker '{pitch_tracker}', expected one of: {', '.join(PITCH_TRACKERS)}"}
+            )
+        
+        profile = requested_profile(request, "analyze")
+        with profile or nullcontext():
+            result = await analyze_audio(audio, sample, sentence, pitch_tracker)
+        if profile is not None:
+            result["timings"] = profile.report()
         logger.info(f"Basic analysis completed, score: {result.get('score', 'unknown')}")
-        return JSONResponse(content=result)
+        with stage("serialization"):
+            response = JSONResponse(content=result)
+        return response
+    except HTTPException as e:
+        logger.error(f"HTTP exception in basic analyze endpoint: {str(e)}")
+        return JSONResponse(
+            status_code=e.status_code,
+            content={"detail": str(e.detail)}
+        )
     except Exception as e:
         logger.error(f"Error in basic analyze endpoint: {str(e)}")
         logger.error(traceback.format_exc())
@@ -1413,9 +1716,11 @@ async def analyze_endpoint(
 
 @app.post("/analyze-audio-enhanced", response_class=JSONResponse)
 async def analyze_enhanced_endpoint(
+    request: Request,
     file: UploadFile = File(...),
     reference_text: str = Form(...),
-    sample_id: str = Form(None)
+    sample_id: str = Form(None),
+    pitch_tracker: str = Form(None)
 ):
     try:
         logger.info(f"Received enhanced analyze request with reference_text: {reference_text}, sample_id: {sample_id}")
@@ -1438,9 +1743,21 @@ async def analyze_enhanced_endpoint(
         except Exception as e:
             logger.error(f"Error checking file size: {str(e)}")
         
-        result = await analyze_audio_enhanced(file, sample_id, reference_text)
+        if pitch_tracker and pitch_tracker not in PITCH_TRACKERS:
+            return JSONResponse(
+                status_code=400,
+                content={"detail": f"Unknown pitch_tracker '{pitch_tracker}', expected one of: {', '.join(PITCH_TRACKERS)}"}
+            )
+        
+        profile = requested_profile(request, "analyze-audio-enhanced")
+        with profile or nullcontext():
+            result = await analyze_audio_enhanced(file, sample_id, reference_text, pitch_tracker)
+        if profile is not None:
+            result["timings"] = profile.report()
         logger.info(f"Enhanced analysis completed, score: {result.get('score', 'unknown')}")
-        return JSONResponse(content=result)
+        with stage("serialization"):
+            response = JSONResponse(content=result)
+        return response
     except HTTPException as e:
         logger.error(f"HTTP exception in enhanced analyze endpoint: {str(e)}")
         return JSONResponse(
@@ -1464,6 +1781,301 @@ async def analyze_enhanced_endpoint(
                 content={"detail": f"Enhanced analysis error: {str(e)}"}
             )
 
+async def run_analysis_job(job, payload: bytes) -> Dict[str, Any]:
+    """Job handler: enhanced analysis of the uploaded audio with the submitted form parameters."""
+    params = job.params
+    try:
+        return await analyze_enhanced_content(payload, params.get("sample_id"), params.get("reference_text"),
+                                              params.get("pitch_tracker"))
+    except HTTPException as e:
+        raise JobError(e.status_code, str(e.detail))
+
+def job_links(job_id: str) -> Dict[str, str]:
+    return {
+        "statusUrl": f"/analyze-audio-enhanced/jobs/{job_id}",
+        "eventsUrl": f"/analyze-audio-enhanced/jobs/{job_id}/events",
+    }
+
+@app.post("/analyze-audio-enhanced/jobs", response_class=JSONResponse)
+async def submit_enhanced_job(
+    file: UploadFile = File(...),
+    reference_text: str = Form(...),
+    sample_id: str = Form(None),
+    pitch_tracker: str = Form(None)
+):
+    """Queue an enhanced analysis and return its job ID immediately (202).
+
+    Poll ``statusUrl`` for the status, current stage and finally the result,
+    or subscribe to ``eventsUrl`` (server-sent events) for stage-by-stage progress.
+    """
+    with stage("upload_read"):
+        content = await file.read()
+    if len(content) < 1000:
+        return JSONResponse(status_code=400, content={"detail": "File âm thanh quá nhỏ hoặc rỗng"})
+    if pitch_tracker and pitch_tracker not in PITCH_TRACKERS:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Unknown pitch_tracker '{pitch_tracker}', expected one of: {', '.join(PITCH_TRACKERS)}"}
+        )
+    try:
+        job = await job_queue.submit(
+            {"reference_text": reference_text, "sample_id": sample_id, "pitch_tracker": pitch_tracker}, content)
+    except JobQueueFullError as e:
+        logger.warning(f"Rejecting analysis job: {str(e)}")
+        return JSONResponse(status_code=503, content={"detail": "Analysis queue is full, please retry later"})
+    logger.info(f"Queued analysis job {job.id} ({len(content)} bytes, reference_text: {reference_text})")
+    return JSONResponse(status_code=202, content=dict(job.to_dict(), **job_links(job.id)))
+
+@app.get("/analyze-audio-enhanced/jobs/{job_id}", response_class=JSONResponse)
+async def get_enhanced_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": f"Job '{job_id}' not found or expired"})
+    return JSONResponse(content=dict(job.to_dict(), **job_links(job.id)))
+
+@app.get("/analyze-audio-enhanced/jobs/{job_id}/events")
+async def enhanced_job_events(job_id: str):
+    """Server-sent events: ``progress`` on every stage change, then one ``done`` or ``failed`` event."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"detail": f"Job '{job_id}' not found or expired"})
+
+    async def events():
+        async for update in job_queue.updates(job, heartbeat=JOB_EVENTS_HEARTBEAT):
+            if update is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            event = update.status if update.is_finished else "progress"
+            data = json.dumps(update.to_dict(include_result=update.is_finished), ensure_ascii=False)
+            yield f"event: {event}\nid: {update.version}\ndata: {data}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.post("/analyze-audio-enhanced/batch")
+async def analyze_enhanced_batch_endpoint(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    manifest: str = Form(None),
+    reference_text: str = Form(None),
+    sample_id: str = Form(None),
+    pitch_tracker: str = Form(None)
+):
+    """Enhanced analysis of many recordings in one request.
+
+    Audio comes as several ``files`` and/or one zip ``archive``. ``manifest``
+    (or ``manifest.json`` inside the archive) lists ``{"file", "reference_text",
+    "sample_id", "id"}`` per item; without it every file uses the form-level
+    ``reference_text``/``sample_id``. Items run concurrently on the shared
+    pools and caches. The response is NDJSON with one line per item, in
+    completion order: ``{"index", "id", "file", "status", "result" | "detail"}``.
+    """
+    if pitch_tracker and pitch_tracker not in PITCH_TRACKERS:
+        return JSONResponse(
+            status_code=400,
+            content={"detail": f"Unknown pitch_tracker '{pitch_tracker}', expected one of: {', '.join(PITCH_TRACKERS)}"}
+        )
+    try:
+        # Multipart files and the archive share one item count and byte budget
+        max_bytes = int(BATCH_MAX_MB * 1024 * 1024)
+        uploads = await read_uploads(files or [], BATCH_MAX_ITEMS, max_bytes)
+        remaining = max_bytes - sum(len(content) for _, content in uploads)
+        manifest_text = manifest
+        if archive is not None and archive.filename:
+            data = await archive.read(remaining + 1)
+            if len(data) > remaining:
+                raise BatchError(f"Batch upload exceeds {max_bytes} bytes")
+            archived, archived_manifest = await asyncio.to_thread(
+                read_zip, data, BATCH_MAX_ITEMS - len(uploads), remaining)
+            uploads.extend(archived)
+            manifest_text = manifest_text or archived_manifest
+        items = build_items(uploads, parse_manifest(manifest_text), reference_text, sample_id, BATCH_MAX_ITEMS)
+    except BatchError as e:
+        logger.error(f"Invalid batch upload: {str(e)}")
+        return JSONResponse(status_code=400, content={"detail": str(e)})
+    logger.info(f"Received batch analyze request with {len(items)} items")
+
+    async def analyze_item(item: BatchItem) -> Dict[str, Any]:
+        line: Dict[str, Any] = {"index": item.index, "id": item.id, "file": item.filename}
+        if len(item.content) < 1000:
+            line.update(status=400, detail="File âm thanh quá nhỏ hoặc rỗng")
+            return line
+        try:
+            result = await analyze_enhanced_content(item.content, item.sample_id, item.reference_text, pitch_tracker)
+            line.update(status=200, result=result)
+        except HTTPException as e:
+            line.update(status=e.status_code, detail=str(e.detail))
+        except Exception as e:
+            logger.error(f"Error in batch item {item.index} ({item.filename}): {str(e)}")
+            line.update(status=500, detail=f"Enhanced analysis error: {str(e)}")
+        return line
+
+    async def ndjson_lines():
+        completed = 0
+        async for line in run_batch(items, analyze_item, BATCH_MAX_CONCURRENCY):
+            completed += 1
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        logger.info(f"Batch analysis completed: {completed} items")
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson",
+                             headers={"X-Batch-Items": str(len(items))})
+
+async def send_stream_error(websocket: WebSocket, status_code: int, detail: str,
+                            traceback_text: Optional[str] = None) -> None:
+    """Report a failed streaming session to the client (if it is still connected) and close the socket."""
+    message = {"type": "error", "status": status_code, "detail": detail}
+    if traceback_text and DEBUG_MODE:
+        message["traceback"] = traceback_text
+    try:
+        await websocket.send_json(message)
+        # 1013 = try again later, 1008 = policy violation (bad input), 1011 = server error
+        await websocket.close(code=1013 if status_code == 503 else 1008 if status_code < 500 else 1011)
+    except Exception:
+        pass
+
+async def receive_stream_message(websocket: WebSocket) -> Dict[str, Any]:
+    message = await asyncio.wait_for(websocket.receive(), timeout=STREAM_IDLE_TIMEOUT)
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    return message
+
+def parse_stream_control(message: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        control = json.loads(message.get("text") or "")
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid stream message: {str(e)}")
+    if not isinstance(control, dict):
+        raise HTTPException(status_code=400, detail="Stream messages must be JSON objects")
+    return control
+
+@app.websocket("/analyze-audio-enhanced/stream")
+async def analyze_enhanced_stream(websocket: WebSocket):
+    """Streaming variant of /analyze-audio-enhanced.
+
+    The client sends a JSON config ``{"reference_text", "sample_id", "pitch_tracker",
+    "format", "sample_rate"}`` (format: pcm_s16le, pcm_f32le, webm, ogg or opus),
+    then binary audio chunks as they are recorded, then ``{"type": "end"}``. The
+    server answers ``ready``, throttled ``partial`` messages (energy, voicing and
+    the new pitch values) and finally ``result`` with the same body as the HTTP
+    endpoint plus ``fallbacks`` (degraded steps, empty for a full analysis), or
+    ``error``. Only formants, ASR and scoring run after ``end``.
+    """
+    await websocket.accept()
+    if stream_stats["active"] >= STREAM_MAX_SESSIONS:
+        stream_stats["rejected"] += 1
+        logger.warning(f"Rejecting streaming session, {stream_stats['active']} already active")
+        await send_stream_error(websocket, 503, "Too many streaming sessions, please retry later")
+        return
+
+    stream_stats["active"] += 1
+    stream: Optional[AudioStream] = None
+    sample_task: Optional[asyncio.Task] = None
+    formant_task: Optional[asyncio.Task] = None
+    try:
+        config = parse_stream_control(await receive_stream_message(websocket))
+        pitch_tracker = config.get("pitch_tracker") or STREAM_PITCH_TRACKER
+        if pitch_tracker not in PITCH_TRACKERS:
+            raise HTTPException(status_code=400, detail=f"Unknown pitch_tracker '{pitch_tracker}', expected one of: {', '.join(PITCH_TRACKERS)}")
+        try:
+            stream = AudioStream(config.get("format", "pcm_s16le"), int(config.get("sample_rate", TARGET_SR)),
+                                 sr=TARGET_SR, max_seconds=STREAM_MAX_SECONDS, ffmpeg_timeout=FFMPEG_TIMEOUT)
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid stream config: {str(e)}")
+
+        sample_id = config.get("sample_id")
+        reference_text = config.get("reference_text") or ""
+        if not reference_text and sample_id and reference_sentence(sample_id):
+            reference_text = reference_sentence(sample_id)
+        logger.info(f"Streaming analysis started: format={stream.format}, sample_rate={stream.sample_rate}, "
+                    f"reference_text='{reference_text}', sample_id='{sample_id}', pitch_tracker={pitch_tracker}")
+
+        # Collects fallbacks of this session, including those of the tasks started below
+        fallbacks: List[str] = []
+        analysis_fallbacks.set(fallbacks)
+
+        # Chuẩn bị đặc trưng mẫu và phân tích kana trong lúc người học còn đang nói
+        sample_task = asyncio.create_task(load_sample_features(sample_id, TARGET_SR, pitch_tracker))
+        if reference_text:
+            kana.analyze(reference_text)
+        await stream.start()
+        await websocket.send_json({"type": "ready", "format": stream.format, "sampleRate": TARGET_SR,
+                                   "pitchTracker": pitch_tracker})
+
+        loop = asyncio.get_running_loop()
+        partial_interval = STREAM_PARTIAL_INTERVAL_MS / 1000.0
+        last_partial = -partial_interval
+        while True:
+            message = await receive_stream_message(websocket)
+            if message.get("bytes") is not None:
+                await stream.feed(message["bytes"])
+                if loop.time() - last_partial >= partial_interval:
+                    last_partial = loop.time()
+                    await websocket.send_json(dict(stream.take_partial(), type="partial"))
+            elif parse_stream_control(message).get("type") == "end":
+                break
+
+        user_y = await stream.finish()
+        if len(user_y) == 0:
+            raise HTTPException(status_code=400, detail="Stream contained no audio")
+        await websocket.send_json(dict(stream.take_partial(), type="partial", final=True))
+        logger.info(f"Stream ended after {stream.features.duration:.2f}s ({stream.bytes_received} bytes), running residual analysis")
+
+        # Phần việc còn lại: formant và ASR chạy song song, pitch YIN đã có từ stream
+        formant_task = asyncio.create_task(dsp_executor.run(audio_features.formant_tracks, user_y, TARGET_SR))
+        transcription, transcription_fallback = await transcribe_with_fallback(user_y, TARGET_SR, reference_text)
+        sample_features = await sample_task
+        user_features: Dict[str, Any] = {}
+        try:
+            user_features["formant_tracks"] = await formant_task
+        except DSPQueueFullError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in streamed formant analysis: {str(e)}")
+            record_fallback("formant")
+        if pitch_tracker == "yin":
+            user_features["pitch_contour"] = stream.features.pitch_contour()
+
+        result = await score_enhanced_analysis(user_y, TARGET_SR, reference_text, transcription, transcription_fallback,
+                                               sample_features, pitch_tracker, user_features=user_features)
+        await websocket.send_json({"type": "result", "result": result, "fallbacks": sorted(set(fallbacks))})
+        await websocket.close(code=1000)
+        stream_stats["completed"] += 1
+        logger.info(f"Streaming analysis completed, score: {result.get('score', 'unknown')}")
+    except WebSocketDisconnect:
+        stream_stats["disconnected"] += 1
+        logger.info("Streaming client disconnected before the analysis finished")
+    except asyncio.TimeoutError:
+        stream_stats["failed"] += 1
+        await send_stream_error(websocket, 408, f"No stream message received for {STREAM_IDLE_TIMEOUT:.0f}s")
+    except HTTPException as e:
+        stream_stats["failed"] += 1
+        logger.error(f"HTTP exception in streaming analysis: {str(e)}")
+        await send_stream_error(websocket, e.status_code, str(e.detail))
+    except StreamLimitError as e:
+        stream_stats["failed"] += 1
+        await send_stream_error(websocket, 413, str(e))
+    except AudioDecodeError as e:
+        stream_stats["failed"] += 1
+        logger.error(f"Error decoding audio stream: {str(e)}")
+        await send_stream_error(websocket, 500, f"Cannot read audio stream: {str(e)}")
+    except DSPQueueFullError as e:
+        stream_stats["failed"] += 1
+        logger.warning(f"Rejecting streaming analysis, DSP pool saturated: {str(e)}")
+        await send_stream_error(websocket, 503, "Analysis server is busy, please retry later")
+    except Exception as e:
+        stream_stats["failed"] += 1
+        logger.error(f"Error in streaming analysis: {str(e)}")
+        logger.error(traceback.format_exc())
+        await send_stream_error(websocket, 500, f"Streaming analysis error: {str(e)}", traceback.format_exc())
+    finally:
+        stream_stats["active"] -= 1
+        for task in (sample_task, formant_task):
+            if task is not None and not task.done():
+                task.cancel()
+        if stream is not None:
+            await stream.aclose()
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     logger.error(f"Validation error: {str(exc)}")
@@ -1500,7 +2112,7 @@ async def analyze_get():
             "endpoint": "/analyze",
             "method": "POST",
             "required_params": ["audio", "sentence"],
-            "optional_params": ["sample"]
+            "optional_params": ["sample", "pitch_tracker"]
         }
     )
 
@@ -1536,7 +2148,7 @@ async def test_libraries():
         results["numpy"] = {"status": "error", "message": str(e)}
     
     try:
-        sample_path = "../speech-java/src/main/resources/samples/hello_friend.wav"
+        sample_path = sample_cache.sample_path("hello_friend")
         if os.path.exists(sample_path):
             y, sr = librosa.load(sample_path)
             results["audio_loading"] = {
@@ -1559,7 +2171,8 @@ async def get_sample_audio(sample_id: str, format: str = "wav"):
     if format not in ["wav", "mp3"]:
         format = "wav"
     
-    sample_path = f"../speech-java/src/main/resources/samples/{sample_id}.{format}"
+    # Cùng thư mục SAMPLES_DIR với cache đặc trưng mẫu
+    sample_path = os.path.splitext(sample_cache.sample_path(sample_id))[0] + f".{format}"
     
     if not os.path.exists(sample_path):
         logger.error(f"Sample audio file not found: {sample_path}")
@@ -1578,20 +2191,13 @@ async def get_sample_audio(sample_id: str, format: str = "wav"):
 async def analyze_direct_sample(sample_id: str):
     """Analyze a specific sample file directly"""
     
-    sample_path = f"../speech-java/src/main/resources/samples/{sample_id}.wav"
+    sample_path = sample_cache.sample_path(sample_id)
     
     if not os.path.exists(sample_path):
         logger.error(f"Sample file not found: {sample_path}")
         raise HTTPException(status_code=404, detail=f"Sample file not found: {sample_id}")
     
-    sentences = {
-        "today_library": "今日、図書館で本を借りました。",
-        "hello_friend": "こんにちは、友達！",
-        "weather_good": "今日の天気はとても良いですね。",
-        "japanese_study": "日本語を勉強することは楽しいです。"
-    }
-    
-    sentence = sentences.get(sample_id)
+    sentence = reference_sentence(sample_id)
     if not sentence:
         logger.error(f"No sentence mapping for sample ID: {sample_id}")
         raise HTTPException(status_code=404, detail=f"No sentence mapping for sample ID: {sample_id}")
@@ -1643,11 +2249,12 @@ async def health_check():
         
         openai_status = "unavailable"
         try:
-            if OPENAI_API_KEY:
-                response = client.chat.completions.create(
+            if OPENAI_API_KEY and openai_pool is not None:
+                response = await openai_pool.chat(
                     model="gpt-3.5-turbo",
                     messages=[{"role": "user", "content": "Say 'ok' in one word"}],
-                    max_tokens=1
+                    max_tokens=1,
+                    timeout=10
                 )
                 if response.choices and response.choices[0].message:
                     openai_status = "available"
@@ -1663,7 +2270,20 @@ async def health_check():
                 "status": "healthy",
                 "libraries": lib_checks,
                 "openai_status": openai_status,
-                "debug_mode": DEBUG_MODE
+                "debug_mode": DEBUG_MODE,
+                "dsp_pool": dsp_executor.stats(),
+                "openai_pool": openai_pool.stats() if openai_pool is not None else None,
+                "transcoder": transcoder.stats(),
+                "streams": dict(stream_stats),
+                "jobs": job_queue.stats(),
+                "llm_cache": llm_cache.stats(),
+                "asr": asr_backend.stats(),
+                "kana_cache": kana.stats(),
+                "text_similarity": text_similarity_stats(),
+                "sentence_catalog": sentence_catalog.stats() if sentence_catalog is not None else None,
+                "transcription_cache": transcription_cache.stats(),
+                "result_cache": dict(result_cache.stats(), in_flight=len(results_inflight)),
+                "sample_cache": sample_cache.stats()
             }
         )
     except Exception as e:
@@ -1673,6 +2293,11 @@ async def health_check():
             content={"status": "unhealthy", "detail": str(e)}
         )
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus scrape endpoint (text exposition format 0.0.4)."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
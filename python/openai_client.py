@@ -0,0 +1,70 @@
+"""Shared async OpenAI client with a keep-alive connection pool and a concurrency cap."""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncOpenAIPool:
+    """Wrap ``AsyncOpenAI`` so Whisper and chat calls overlap without blocking the event loop.
+
+    All calls share one ``httpx.AsyncClient`` (keep-alive connections are reused
+    across requests) and a global semaphore limiting in-flight API calls.
+    """
+
+    def __init__(self, api_key: Optional[str], max_concurrency: int = 16,
+                 max_connections: int = 32, max_keepalive: int = 16,
+                 whisper_timeout: float = 60.0, chat_timeout: float = 30.0,
+                 max_retries: int = 2):
+        self.whisper_timeout = whisper_timeout
+        self.chat_timeout = chat_timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(max(whisper_timeout, chat_timeout), connect=10.0)
+        )
+        self.client = AsyncOpenAI(api_key=api_key, http_client=self._http, max_retries=max_retries)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._in_flight = 0
+
+    async def transcribe(self, file: Tuple[str, bytes], language: str = "ja",
+                         model: str = "whisper-1", timeout: Optional[float] = None) -> str:
+        """Transcribe ``(filename, content)`` and return the recognized text."""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self.client.audio.transcriptions.create(
+                    model=model,
+                    file=file,
+                    language=language,
+                    timeout=timeout or self.whisper_timeout
+                )
+            finally:
+                self._in_flight -= 1
+        return response.text
+
+    async def chat(self, messages: List[Dict[str, str]], model: str = "gpt-3.5-turbo",
+                   timeout: Optional[float] = None, **kwargs: Any):
+        """Create a chat completion and return the raw response."""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                return await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    timeout=timeout or self.chat_timeout,
+                    **kwargs
+                )
+            finally:
+                self._in_flight -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self._in_flight, "max_concurrency": self.max_concurrency}
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+        logger.info("OpenAI connection pool closed")
@@ -0,0 +1,91 @@
+"""Table-driven classification of kana substitutions (expected -> actual).
+
+Rules live in ``data/phonetic_confusions.json`` so linguists can extend them
+without touching code. Rule order is priority order. ``pairs`` and ``within``
+rules are expanded once at load time into a dict keyed by (expected, actual),
+so classifying a substitution is a single lookup; only pairs outside the
+table fall through to the ordered ``expected_contains`` rules.
+"""
+import hashlib
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFUSIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "phonetic_confusions.json")
+CONFUSIONS_VERSION = 1
+
+Classification = Tuple[str, str]
+
+
+def _substrings(text: str) -> List[str]:
+    return sorted({text[i:j] for i in range(len(text)) for j in range(i + 1, len(text) + 1)})
+
+
+class ConfusionTable:
+    """Compiled confusion rules: ``classify(expected, actual)`` -> ``(category, message)``."""
+
+    def __init__(self, rules: List[Dict[str, Any]], default: Dict[str, str]):
+        self.rules = rules
+        self.default = (default["category"], default["message"])
+        # Changes whenever a rule or message is edited; part of the result cache key
+        self.fingerprint = hashlib.sha256(json.dumps([rules, default], ensure_ascii=False, sort_keys=True)
+                                          .encode("utf-8")).hexdigest()[:16]
+        self._contains_rules: List[Tuple[int, str, str, str]] = []
+        self._table: Dict[Tuple[str, str], Tuple[int, str, str]] = {}
+
+        for priority, rule in enumerate(rules):
+            category, message = rule["category"], rule["message"]
+            if "pairs" in rule:
+                pairs = [tuple(pair) for pair in rule["pairs"]]
+            elif "within" in rule:
+                members = _substrings(rule["within"])
+                pairs = [(expected, actual) for expected in members for actual in members if expected != actual]
+            elif "expected_contains" in rule:
+                self._contains_rules.append((priority, rule["expected_contains"], category, message))
+                continue
+            else:
+                raise ValueError(f"Confusion rule '{category}' needs 'pairs', 'within' or 'expected_contains'")
+            for expected, actual in pairs:
+                # An earlier rule (of any kind) keeps precedence over this one
+                if (expected, actual) in self._table or self._contains_match(expected, actual, priority):
+                    continue
+                self._table[(expected, actual)] = (priority, category, message)
+
+        self._fallback = lru_cache(maxsize=4096)(self._classify_fallback)
+
+    def _contains_match(self, expected: str, actual: str, before: int) -> Optional[Tuple[str, str]]:
+        for priority, text, category, message in self._contains_rules:
+            if priority >= before:
+                break
+            if text in expected and text not in actual:
+                return category, message
+        return None
+
+    def _classify_fallback(self, expected: str, actual: str) -> Classification:
+        category, template = self._contains_match(expected, actual, len(self.rules)) or self.default
+        return category, template.format(expected=expected, actual=actual)
+
+    def classify(self, expected: str, actual: str) -> Classification:
+        entry = self._table.get((expected, actual))
+        if entry is not None:
+            _, category, template = entry
+            return category, template.format(expected=expected, actual=actual)
+        return self._fallback(expected, actual)
+
+    def __len__(self) -> int:
+        return len(self._table)
+
+
+def load_confusion_table(path: str = DEFAULT_CONFUSIONS_PATH) -> ConfusionTable:
+    """Load and compile the rule file; raises on a missing or malformed file."""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != CONFUSIONS_VERSION:
+        raise ValueError(f"Unsupported phonetic confusion table version: {data.get('version')}")
+    table = ConfusionTable(data["rules"], data["default"])
+    logger.info(f"Loaded {len(data['rules'])} phonetic confusion rules ({len(table)} pairs) from {path}")
+    return table
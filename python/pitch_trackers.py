@@ -0,0 +1,122 @@
+"""Interchangeable F0 trackers.
+
+Every backend takes a mono float signal and returns ``(times, f0, voiced)``:
+frame centre times in seconds, F0 in Hz (NaN where unvoiced) and a boolean
+voiced mask. Backends are registered in ``PITCH_TRACKERS`` by name.
+"""
+from typing import Callable, Dict, Tuple
+
+import aubio
+import librosa
+import numpy as np
+import parselmouth
+
+FMIN = librosa.note_to_hz('C2')
+FMAX = librosa.note_to_hz('C7')
+HOP_LENGTH = 256
+DEFAULT_TRACKER = "pyin"
+
+# aubio YIN settings: analysis window, voicing confidence threshold and silence gate (dB)
+YIN_WIN_LENGTH = 2048
+YIN_TOLERANCE = 0.15
+YIN_MIN_CONFIDENCE = 0.8
+YIN_SILENCE_DB = -50.0
+
+PitchTrack = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def track_pyin(y: np.ndarray, sr: int, hop_length: int = HOP_LENGTH) -> PitchTrack:
+    """Probabilistic YIN (librosa): most robust, slowest."""
+    f0, voiced_flag, _ = librosa.pyin(y, fmin=FMIN, fmax=FMAX, sr=sr, hop_length=hop_length)
+    times = librosa.frames_to_time(np.arange(len(f0)), sr=sr, hop_length=hop_length)
+    return times, f0, ~np.isnan(f0) & voiced_flag
+
+
+def track_praat(y: np.ndarray, sr: int, hop_length: int = HOP_LENGTH) -> PitchTrack:
+    """Praat autocorrelation pitch via parselmouth."""
+    snd = parselmouth.Sound(np.asarray(y, dtype=np.float64), sr)
+    pitch = snd.to_pitch(time_step=hop_length / sr, pitch_floor=FMIN, pitch_ceiling=FMAX)
+    f0 = pitch.selected_array['frequency'].astype(np.float64)
+    voiced = f0 > 0
+    f0[~voiced] = np.nan
+    return np.asarray(pitch.xs()), f0, voiced
+
+
+class YinStream:
+    """Stateful aubio YIN tracker fed one hop at a time, e.g. while audio is still being recorded.
+
+    Feeding a signal in arbitrary chunks and calling ``flush`` yields exactly
+    the frames of ``track_yin`` on the whole signal.
+    """
+
+    def __init__(self, sr: int, hop_length: int = HOP_LENGTH):
+        self.sr = sr
+        self.hop_length = hop_length
+        self._detector = aubio.pitch("yinfast", YIN_WIN_LENGTH, hop_length, sr)
+        self._detector.set_unit("Hz")
+        self._detector.set_tolerance(YIN_TOLERANCE)
+        self._detector.set_silence(YIN_SILENCE_DB)
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self.frames = 0
+
+    def process(self, samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """F0 (NaN when unvoiced) and voiced mask of every complete hop now available."""
+        signal = np.concatenate((self._remainder, np.asarray(samples, dtype=np.float32)))
+        n_frames = len(signal) // self.hop_length
+        self._remainder = signal[n_frames * self.hop_length:]
+        return self._track(signal[:n_frames * self.hop_length].reshape(n_frames, self.hop_length))
+
+    def flush(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Track the last partial hop, zero-padded; the stream is finished afterwards."""
+        if len(self._remainder) == 0:
+            return np.zeros(0, dtype=np.float64), np.zeros(0, dtype=bool)
+        frame = np.zeros((1, self.hop_length), dtype=np.float32)
+        frame[0, :len(self._remainder)] = self._remainder
+        self._remainder = np.zeros(0, dtype=np.float32)
+        return self._track(frame)
+
+    def _track(self, frames: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        f0 = np.empty(len(frames), dtype=np.float64)
+        confidence = np.empty(len(frames), dtype=np.float64)
+        for i, frame in enumerate(frames):
+            f0[i] = self._detector(np.ascontiguousarray(frame))[0]
+            confidence[i] = self._detector.get_confidence()
+        self.frames += len(frames)
+        voiced = (confidence >= YIN_MIN_CONFIDENCE) & (f0 >= FMIN) & (f0 <= FMAX)
+        f0[~voiced] = np.nan
+        return f0, voiced
+
+    def frame_times(self, n_frames: int) -> np.ndarray:
+        # aubio reports the pitch of the window ending at the current hop
+        times = (np.arange(n_frames) * self.hop_length + self.hop_length - YIN_WIN_LENGTH / 2) / self.sr
+        return np.maximum(times, 0.0)
+
+
+def track_yin(y: np.ndarray, sr: int, hop_length: int = HOP_LENGTH) -> PitchTrack:
+    """aubio YIN (FFT-based ``yinfast`` implementation): fastest, no voicing model beyond confidence."""
+    stream = YinStream(sr, hop_length)
+    f0, voiced = stream.process(y)
+    tail_f0, tail_voiced = stream.flush()
+    f0 = np.concatenate((f0, tail_f0))
+    voiced = np.concatenate((voiced, tail_voiced))
+    return stream.frame_times(len(f0)), f0, voiced
+
+
+PITCH_TRACKERS: Dict[str, Callable[..., PitchTrack]] = {
+    "pyin": track_pyin,
+    "praat": track_praat,
+    "yin": track_yin,
+}
+
+
+def get_pitch_tracker(name: str) -> Callable[..., PitchTrack]:
+    """Look up a backend by name, raising ValueError for unknown names."""
+    try:
+        return PITCH_TRACKERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown pitch tracker '{name}', expected one of: {', '.join(PITCH_TRACKERS)}")
+
+
+def track_pitch(y: np.ndarray, sr: int, tracker: str = DEFAULT_TRACKER,
+                hop_length: int = HOP_LENGTH) -> PitchTrack:
+    return get_pitch_tracker(tracker)(y, sr, hop_length)
@@ -0,0 +1,69 @@
+"""Precompute reference sample features into a memory-mapped index.
+
+Usage:
+    python precompute_samples.py --samples-dir ../nihongo-it-backend/src/main/resources/samples \
+        --out sample_features_index
+
+Point the service at the result with FEATURE_INDEX_DIR; samples whose file
+mtime changed since the build are recomputed live.
+"""
+import argparse
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Tuple
+
+from dotenv import load_dotenv
+
+import audio_features
+from feature_index import write_feature_index
+from pitch_trackers import PITCH_TRACKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("precompute_samples")
+
+
+def _extract(args: Tuple[str, str, int, str]) -> Tuple[str, float, Dict[str, Any]]:
+    sample_id, path, sr, tracker = args
+    mtime = os.path.getmtime(path)
+    return sample_id, mtime, audio_features.load_sample_features(path, sr, tracker)
+
+
+def main() -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the reference sample feature index")
+    parser.add_argument("--samples-dir", default=os.getenv("SAMPLES_DIR", "../nihongo-it-backend/src/main/resources/samples"))
+    parser.add_argument("--out", default=os.getenv("FEATURE_INDEX_DIR", "sample_features_index"))
+    parser.add_argument("--sr", type=int, default=16000, help="Sample rate used by the analysis service")
+    parser.add_argument("--tracker", choices=sorted(PITCH_TRACKERS), default=os.getenv("PITCH_TRACKER", "pyin"),
+                        help="Pitch tracker; must match the service's PITCH_TRACKER")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.samples_dir):
+        logger.error(f"Samples directory not found: {args.samples_dir}")
+        return 1
+
+    jobs = [
+        (os.path.splitext(name)[0], os.path.join(args.samples_dir, name), args.sr, args.tracker)
+        for name in sorted(os.listdir(args.samples_dir))
+        if name.lower().endswith(".wav")
+    ]
+    logger.info(f"Extracting features for {len(jobs)} samples with {args.workers} workers")
+
+    entries = []
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        for result in pool.map(_extract, jobs):
+            sample_id, _, features = result
+            logger.info(f"{sample_id}: {features['stats']['duration']:.2f}s, "
+                        f"{len(features['pitch_contour'])} voiced frames, {len(features['f1_values'])} F1 values")
+            entries.append(result)
+
+    count = write_feature_index(args.out, args.sr, args.tracker, entries)
+    logger.info(f"Wrote feature index for {count} samples to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
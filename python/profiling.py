@@ -0,0 +1,93 @@
+"""Opt-in profiling of a single analysis request.
+
+``RequestProfile`` collects the ``metrics.stage`` timings of the request into
+a breakdown that is attached to its JSON response and, in ``cprofile`` mode,
+also writes a cProfile dump (open with ``python -m pstats`` or snakeviz).
+
+cProfile only sees the event loop thread: work in the DSP process pool shows
+up as time spent awaiting it, and coroutines of other requests running at the
+same time are included. Only one request is profiled at a time.
+"""
+import cProfile
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from metrics import StageTiming, record_timings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("timings", "cprofile")
+
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """Context manager around the handling of one request; ``report()`` after it exits."""
+
+    def __init__(self, name: str, mode: str = "timings", profile_dir: Optional[str] = None):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}', expected one of: {', '.join(PROFILE_MODES)}")
+        self.name = name
+        self.mode = mode
+        self.profile_dir = profile_dir
+        self.profile_path: Optional[str] = None
+        self.profile_error: Optional[str] = None
+        self._timings: List[StageTiming] = []
+        self._recording = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._start = 0.0
+        self._elapsed = 0.0
+
+    def __enter__(self) -> "RequestProfile":
+        self._recording = record_timings()
+        self._timings = self._recording.__enter__()
+        if self.mode == "cprofile":
+            if _profiler_lock.acquire(blocking=False):
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            else:
+                self.profile_error = "Another request is being profiled"
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._elapsed = time.perf_counter() - self._start
+        self._recording.__exit__(exc_type, exc, tb)
+        if self._profiler is not None:
+            self._profiler.disable()
+            try:
+                self.profile_path = self._dump()
+            except OSError as e:
+                logger.error(f"Cannot write profile of {self.name}: {str(e)}")
+                self.profile_error = f"Cannot write profile: {str(e)}"
+            finally:
+                self._profiler = None
+                _profiler_lock.release()
+
+    def _dump(self) -> str:
+        os.makedirs(self.profile_dir or ".", exist_ok=True)
+        filename = f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.prof"
+        path = os.path.join(self.profile_dir or ".", filename)
+        self._profiler.dump_stats(path)
+        logger.info(f"Wrote profile of {self.name} to {path}")
+        return path
+
+    def report(self) -> Dict[str, Any]:
+        """Stage timings in milliseconds, in the order the stages finished, with offsets from the request start."""
+        report = {
+            "mode": self.mode,
+            "totalMs": round(self._elapsed * 1000, 2),
+            "stages": [
+                {"stage": name, "startMs": round((start - self._start) * 1000, 2), "ms": round(seconds * 1000, 2)}
+                for name, start, seconds in self._timings
+            ],
+        }
+        if self.mode == "cprofile":
+            report["profileFile"] = self.profile_path
+            if self.profile_error:
+                report["profileError"] = self.profile_error
+        return report
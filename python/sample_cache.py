@@ -0,0 +1,135 @@
+"""Memory-bounded cache of reference sample features, invalidated by file mtime."""
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from caches import shared_call
+from feature_index import FeatureIndex
+
+logger = logging.getLogger(__name__)
+
+
+def features_nbytes(features: Dict[str, Any]) -> int:
+    """Approximate memory held by the NumPy arrays of a feature dict."""
+    return sum(v.nbytes for v in features.values() if isinstance(v, np.ndarray))
+
+
+class SampleFeatureCache:
+    """LRU cache of ``audio_features.sample_features`` results per (sample_id, sr, tracker).
+
+    An entry is reused only while the sample file's mtime is unchanged. Total
+    array memory is capped at ``max_bytes``; least recently used samples are
+    evicted first. Concurrent misses for the same sample share one computation.
+    When a precomputed ``FeatureIndex`` is attached, fresh index entries are
+    served straight from the memory-mapped arrays and never computed.
+    """
+
+    def __init__(self, samples_dir: str, max_bytes: int,
+                 compute: Callable[[str, int, str], Awaitable[Optional[Dict[str, Any]]]],
+                 index: Optional[FeatureIndex] = None):
+        self.samples_dir = samples_dir
+        self.max_bytes = max_bytes
+        self.index = index
+        self._compute = compute
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[float, Dict[str, Any], int]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, int, str, float], asyncio.Task] = {}
+        # Last mtime seen by get() per sample (None: file missing)
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sample_path(self, sample_id: str) -> str:
+        return os.path.join(self.samples_dir, f"{os.path.basename(sample_id)}.wav")
+
+    def sample_mtime(self, sample_id: str) -> Optional[float]:
+        """Modification time of the sample audio (None when missing) as last seen by ``get``.
+
+        The file is only stat'ed here for a sample ``get`` has not seen yet;
+        every ``get`` refreshes the value, so a replaced file is noticed by the
+        next request that loads the sample's features.
+        """
+        if sample_id not in self._mtimes:
+            self._mtimes[sample_id] = self._stat(self.sample_path(sample_id))
+        return self._mtimes[sample_id]
+
+    @staticmethod
+    def _stat(path: str) -> Optional[float]:
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    async def get(self, sample_id: str, sr: int, tracker: str) -> Optional[Dict[str, Any]]:
+        """Return cached features for ``sample_id``, computing them on a miss or stale mtime."""
+        path = self.sample_path(sample_id)
+        mtime = self._mtimes[sample_id] = self._stat(path)
+        if mtime is None:
+            logger.warning(f"Sample audio not found: {path}")
+            return None
+
+        key = (sample_id, sr, tracker)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == mtime:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if self.index is not None:
+            features = self.index.get(sample_id, sr, tracker, mtime)
+            if features is not None:
+                return features
+
+        with self._lock:
+            self.misses += 1
+
+        return await shared_call(self._inflight, (sample_id, sr, tracker, mtime),
+                                 lambda: self._load(sample_id, path, sr, tracker, mtime))
+
+    async def _load(self, sample_id: str, path: str, sr: int, tracker: str, mtime: float) -> Optional[Dict[str, Any]]:
+        features = await self._compute(path, sr, tracker)
+        if features is not None:
+            logger.info(f"Computed sample features for '{sample_id}'")
+            self._store((sample_id, sr, tracker), mtime, features)
+        return features
+
+    def put(self, sample_id: str, sr: int, tracker: str, mtime: float, features: Dict[str, Any]) -> None:
+        self._store((sample_id, sr, tracker), mtime, features)
+
+    def _store(self, key: Tuple[str, int, str], mtime: float, features: Dict[str, Any]) -> None:
+        size = features_nbytes(features)
+        if size > self.max_bytes:
+            logger.warning(f"Sample features for '{key[0]}' ({size} bytes) exceed the cache limit, not caching")
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (mtime, features, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "index_samples": len(self.index) if self.index is not None else 0,
+            "index_hits": self.index.hits if self.index is not None else 0,
+        }
@@ -0,0 +1,222 @@
+"""Precompiled linguistic catalog of lesson reference sentences.
+
+Each entry holds the ``kana.KanaText`` analysis of a reference sentence
+(tokens, per-token readings and spans, morae, syllable count) under one or
+more sentence IDs. Sources are the vocabulary terms and example sentences in
+``ddl/02-init-data.sql`` and the sample recordings in ``SAMPLE_SENTENCES``.
+
+The catalog is built at startup or offline with ``build_sentence_catalog.py``
+and pinned into the ``KanaConverter``, so requests for lesson sentences never
+run pykakasi; unseen sentences fall back to live conversion.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from kana import KanaConverter, KanaText
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION = 1
+
+# Câu mẫu của các file âm thanh mẫu (sample_id -> câu)
+SAMPLE_SENTENCES: Dict[str, str] = {
+    "today_library": "今日、図書館で本を借りました。",
+    "hello_friend": "こんにちは、友達！",
+    "weather_good": "今日の天気はとても良いですね。",
+    "japanese_study": "日本語を勉強することは楽しいです。"
+}
+
+_INSERT_REGEX = re.compile(r"INSERT\s+INTO\s+(\w+)\s*\(([^)]*)\)\s*VALUES", re.IGNORECASE)
+
+
+def _split_sql_values(sql: str, start: int) -> Tuple[List[List[str]], int]:
+    """Parse ``(v1, v2, ...), (...)`` tuples from ``start`` up to the terminating ``;``.
+
+    Returns raw value strings (string literals unquoted, everything else
+    verbatim) and the index after the statement.
+    """
+    rows: List[List[str]] = []
+    row: List[str] = []
+    value: List[str] = []
+    depth = 0
+    in_string = False
+    quoted = False
+    i = start
+    while i < len(sql):
+        char = sql[i]
+        if in_string:
+            if char == "'":
+                if sql.startswith("''", i):
+                    value.append("'")
+                    i += 2
+                    continue
+                in_string = False
+            else:
+                value.append(char)
+        elif char == "'":
+            in_string = True
+            if depth == 1 and not ''.join(value).strip():
+                # A plain string literal: keep its content without surrounding whitespace
+                quoted = True
+                value = []
+        elif char == "(":
+            depth += 1
+            if depth > 1:
+                value.append(char)
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                row.append(''.join(value) if quoted else ''.join(value).strip())
+                rows.append(row)
+                row, value, quoted = [], [], False
+            else:
+                value.append(char)
+        elif char == "," and depth == 1:
+            row.append(''.join(value) if quoted else ''.join(value).strip())
+            value, quoted = [], False
+        elif char == ";" and depth == 0:
+            return rows, i + 1
+        elif depth > 0:
+            value.append(char)
+        i += 1
+    return rows, i
+
+
+def extract_vocabulary_sentences(sql_path: str) -> Dict[str, str]:
+    """Sentence ID -> text for every vocabulary ``term`` and ``example`` in a seed-data SQL file.
+
+    IDs are ``vocabulary:<term>`` and ``vocabulary:<term>:example`` because the
+    rows only get random UUIDs at insert time.
+    """
+    with open(sql_path, encoding="utf-8") as f:
+        sql = f.read()
+
+    sentences: Dict[str, str] = {}
+    for match in _INSERT_REGEX.finditer(sql):
+        if match.group(1).lower() != "vocabulary":
+            continue
+        columns = [column.strip() for column in match.group(2).split(",")]
+        rows, _ = _split_sql_values(sql, match.end())
+        for row in rows:
+            if len(row) != len(columns):
+                logger.warning(f"Skipping vocabulary row with {len(row)} values, expected {len(columns)}")
+                continue
+            values = dict(zip(columns, row))
+            term = values.get("term", "")
+            if term and term.upper() != "NULL":
+                sentences[f"vocabulary:{term}"] = term
+                example = values.get("example", "")
+                if example and example.upper() != "NULL":
+                    sentences[f"vocabulary:{term}:example"] = example
+    return sentences
+
+
+class SentenceCatalog:
+    """Precomputed ``KanaText`` per reference sentence, addressable by text or sentence ID."""
+
+    def __init__(self, analyses: Iterable[KanaText], ids: Dict[str, str]):
+        self._by_text: Dict[str, KanaText] = {analysis.text: analysis for analysis in analyses}
+        self._ids = {sentence_id: text for sentence_id, text in ids.items() if text in self._by_text}
+
+    def __len__(self) -> int:
+        return len(self._by_text)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self._by_text
+
+    def analyses(self) -> List[KanaText]:
+        return list(self._by_text.values())
+
+    def sentence_ids(self) -> Dict[str, str]:
+        return dict(self._ids)
+
+    def text_for_id(self, sentence_id: str) -> Optional[str]:
+        return self._ids.get(sentence_id)
+
+    def get(self, text: str) -> Optional[KanaText]:
+        return self._by_text.get(text)
+
+    def get_by_id(self, sentence_id: str) -> Optional[KanaText]:
+        text = self._ids.get(sentence_id)
+        return self.get(text) if text is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sentences": len(self._by_text), "ids": len(self._ids)}
+
+
+def build_sentence_catalog(sentences: Dict[str, str], converter: KanaConverter) -> SentenceCatalog:
+    """Analyze every distinct sentence once; ``sentences`` maps sentence ID -> text."""
+    analyses = {}
+    for text in sentences.values():
+        if text not in analyses:
+            analyses[text] = converter.analyze(text)
+    return SentenceCatalog(analyses.values(), sentences)
+
+
+def catalog_sentences(sql_path: Optional[str]) -> Dict[str, str]:
+    """All catalog sources: sample sentences plus the vocabulary of ``sql_path`` when it exists."""
+    sentences = dict(SAMPLE_SENTENCES)
+    if sql_path and os.path.exists(sql_path):
+        sentences.update(extract_vocabulary_sentences(sql_path))
+    elif sql_path:
+        logger.warning(f"Lesson data not found: {sql_path}")
+    return sentences
+
+
+def write_sentence_catalog(path: str, catalog: SentenceCatalog) -> int:
+    """Write the catalog as JSON (atomically replacing ``path``); returns the sentence count."""
+    ids_by_text: Dict[str, List[str]] = {}
+    for sentence_id, text in catalog.sentence_ids().items():
+        ids_by_text.setdefault(text, []).append(sentence_id)
+    payload = {
+        "version": CATALOG_VERSION,
+        "sentences": [
+            dict(analysis._asdict(), ids=sorted(ids_by_text.get(analysis.text, [])))
+            for analysis in catalog.analyses()
+        ],
+    }
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".sentence-catalog-", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return len(catalog)
+
+
+def load_sentence_catalog(path: str) -> Optional[SentenceCatalog]:
+    """Load a catalog written by ``write_sentence_catalog``, returning None (and logging) when missing or unreadable."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload.get("version") != CATALOG_VERSION:
+            raise ValueError(f"Unsupported sentence catalog version: {payload.get('version')}")
+        analyses, ids = [], {}
+        for entry in payload["sentences"]:
+            analysis = KanaText(
+                text=entry["text"],
+                hiragana=entry["hiragana"],
+                tokens=tuple(entry["tokens"]),
+                token_hiragana=tuple(entry["token_hiragana"]),
+                token_spans=tuple(tuple(span) for span in entry["token_spans"]),
+                morae=tuple(entry["morae"]),
+                syllables=entry["syllables"],
+            )
+            analyses.append(analysis)
+            ids.update((sentence_id, analysis.text) for sentence_id in entry.get("ids", []))
+        catalog = SentenceCatalog(analyses, ids)
+        logger.info(f"Loaded sentence catalog with {len(catalog)} sentences from {path}")
+        return catalog
+    except Exception as e:
+        logger.error(f"Error loading sentence catalog from {path}: {str(e)}")
+        return None
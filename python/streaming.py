@@ -0,0 +1,192 @@
+"""Incremental analysis of audio streamed while the learner is still speaking.
+
+Chunks arrive as raw PCM or as an encoded recording (webm/ogg opus from
+MediaRecorder, decoded by a long-running ffmpeg). Energy, aubio YIN pitch and
+voicing are updated per chunk, so when the stream ends only the stages that
+need the whole utterance (formants, ASR, scoring, LLM) are left to run.
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from audio_io import TARGET_SR, AudioDecodeError, FFmpegStreamDecoder
+from pitch_trackers import YinStream
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = ("pcm_s16le", "pcm_f32le", "webm", "ogg", "opus")
+_PCM_DTYPES = {"pcm_s16le": np.dtype("<i2"), "pcm_f32le": np.dtype("<f4")}
+
+
+class StreamLimitError(ValueError):
+    """Raised when a stream exceeds the configured maximum duration."""
+
+
+class StreamingFeatures:
+    """Running RMS energy, YIN pitch track and voicing of a growing mono signal."""
+
+    def __init__(self, sr: int = TARGET_SR):
+        self.sr = sr
+        self._yin = YinStream(sr)
+        self._chunks: List[np.ndarray] = []
+        self._f0: List[np.ndarray] = []
+        self._voiced: List[np.ndarray] = []
+        self.samples = 0
+        self.sum_squares = 0.0
+        self.last_rms = 0.0
+        self.frames = 0
+        self.voiced_frames = 0
+        self.voiced_sum = 0.0
+
+    def add(self, samples: np.ndarray) -> np.ndarray:
+        """Append samples; returns the voiced F0 values (Hz) of the newly completed frames."""
+        samples = np.asarray(samples, dtype=np.float32)
+        if len(samples) == 0:
+            return np.zeros(0, dtype=np.float64)
+        self._chunks.append(samples)
+        self.samples += len(samples)
+        energy = float(np.dot(samples.astype(np.float64), samples))
+        self.sum_squares += energy
+        self.last_rms = float(np.sqrt(energy / len(samples)))
+        return self._append_pitch(*self._yin.process(samples))
+
+    def finish(self) -> np.ndarray:
+        """Track the last partial hop; no samples may be added afterwards."""
+        return self._append_pitch(*self._yin.flush())
+
+    def _append_pitch(self, f0: np.ndarray, voiced: np.ndarray) -> np.ndarray:
+        self._f0.append(f0)
+        self._voiced.append(voiced)
+        self.frames += len(f0)
+        new_pitch = f0[voiced]
+        self.voiced_frames += len(new_pitch)
+        self.voiced_sum += float(np.sum(new_pitch))
+        return new_pitch
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sr
+
+    @property
+    def rms(self) -> float:
+        return float(np.sqrt(self.sum_squares / self.samples)) if self.samples else 0.0
+
+    def waveform(self) -> np.ndarray:
+        return np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.float32)
+
+    def pitch_contour(self) -> Optional[np.ndarray]:
+        """Voiced F0 values, as ``audio_features.pitch_contour(y, sr, "yin")`` would return them."""
+        if self.samples == 0 or self.voiced_frames == 0:
+            return None
+        f0 = np.concatenate(self._f0)
+        return f0[np.concatenate(self._voiced)]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "duration": round(self.duration, 3),
+            "rms": round(self.rms, 6),
+            "level": round(self.last_rms, 6),
+            "frames": self.frames,
+            "voicedFrames": self.voiced_frames,
+            "voicedRatio": round(self.voiced_frames / self.frames, 3) if self.frames else 0.0,
+            "pitchMean": round(self.voiced_sum / self.voiced_frames, 2) if self.voiced_frames else 0.0,
+        }
+
+
+class AudioStream:
+    """One streamed recording: decodes incoming chunks and feeds ``StreamingFeatures``.
+
+    PCM at ``sr`` is converted in place; other sample rates and encoded
+    formats go through an ``FFmpegStreamDecoder`` whose output is consumed by
+    a background reader task.
+    """
+
+    def __init__(self, fmt: str, sample_rate: int = TARGET_SR, sr: int = TARGET_SR,
+                 max_seconds: float = 60.0, ffmpeg_timeout: float = 20.0):
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"Unknown stream format '{fmt}', expected one of: {', '.join(STREAM_FORMATS)}")
+        if sample_rate <= 0:
+            raise ValueError(f"Invalid sample rate {sample_rate}")
+        self.format = fmt
+        self.sample_rate = sample_rate
+        self.sr = sr
+        self.max_samples = int(max_seconds * sr)
+        self.features = StreamingFeatures(sr)
+        self.bytes_received = 0
+        self._dtype: Optional[np.dtype] = None
+        self._decoder: Optional[FFmpegStreamDecoder] = None
+        if fmt in _PCM_DTYPES and sample_rate == sr:
+            self._dtype = _PCM_DTYPES[fmt]
+        else:
+            # Headerless PCM at another rate needs its layout spelled out; containers are probed
+            input_args = ("-f", fmt[len("pcm_"):], "-ar", str(sample_rate), "-ac", "1") if fmt in _PCM_DTYPES else ()
+            self._decoder = FFmpegStreamDecoder(sr, input_args, timeout=ffmpeg_timeout)
+        self._remainder = b""
+        self._reader: Optional[asyncio.Task] = None
+        self._new_pitch: List[np.ndarray] = []
+
+    async def start(self) -> None:
+        if self._decoder is not None:
+            await self._decoder.start()
+            self._reader = asyncio.create_task(self._read_decoded())
+
+    async def _read_decoded(self) -> None:
+        while True:
+            samples = await self._decoder.read()
+            if samples is None:
+                return
+            await self._add(samples)
+
+    async def _add(self, samples: np.ndarray) -> None:
+        if self.features.samples + len(samples) > self.max_samples:
+            raise StreamLimitError(f"Stream is longer than {self.max_samples / self.sr:.0f}s")
+        new_pitch = await asyncio.to_thread(self.features.add, samples)
+        if len(new_pitch):
+            self._new_pitch.append(new_pitch)
+
+    async def feed(self, data: bytes) -> None:
+        """Process one received chunk."""
+        self.bytes_received += len(data)
+        if self._decoder is None:
+            data = self._remainder + data
+            usable = len(data) - len(data) % self._dtype.itemsize
+            self._remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=self._dtype)
+            if self._dtype.kind == "i":
+                samples = samples.astype(np.float32) / 32768.0
+            await self._add(samples)
+            return
+        if self._reader.done():
+            # Surface decode/limit errors of the reader as soon as the client sends more
+            self._reader.result()
+            raise AudioDecodeError("ffmpeg closed its output before the stream ended")
+        await self._decoder.write(data)
+
+    def take_partial(self) -> Dict[str, Any]:
+        """Current running features plus the voiced F0 values added since the previous call."""
+        partial = self.features.snapshot()
+        pitch = np.concatenate(self._new_pitch) if self._new_pitch else np.zeros(0)
+        self._new_pitch = []
+        partial["pitchData"] = [round(float(value), 2) for value in pitch]
+        return partial
+
+    async def finish(self) -> np.ndarray:
+        """Drain the decoder, complete the pitch track and return the whole waveform."""
+        if self._decoder is not None:
+            await self._decoder.close_input()
+            await self._reader
+            await self._decoder.wait()
+        await asyncio.to_thread(self.features.finish)
+        return self.features.waveform()
+
+    async def aclose(self) -> None:
+        if self._reader is not None and not self._reader.done():
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._decoder is not None:
+            await self._decoder.aclose()
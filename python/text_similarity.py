@@ -0,0 +1,95 @@
+"""Normalized edit-distance similarity between a reference and a transcription.
+
+``normalized_similarity`` is ``1 - levenshtein(a, b) / max(len(a), len(b))``:
+one inserted or dropped character costs one edit instead of shifting every
+following position. Callers pass kana-normalized text (see ``main.kana_key``)
+so script differences (漢字 vs. かな) do not count as errors.
+
+Distances come from ``rapidfuzz`` (C++) when it is installed, otherwise from a
+bit-parallel Levenshtein (Myers/Hyyrö) on Python integers, which handles a
+whole column of the DP table per step. ``similarity_batch`` scores many pairs
+at once (multi-threaded with rapidfuzz) for offline rescoring.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+    from rapidfuzz.process import cpdist as _rf_cpdist
+except ImportError:  # Optional dependency
+    _rf_levenshtein = None
+    _rf_cpdist = None
+
+SIMILARITY_BACKEND = "rapidfuzz" if _rf_levenshtein is not None else "bitparallel"
+
+
+def _bitparallel_distance(a: str, b: str) -> int:
+    """Levenshtein distance with one bit per character of ``a`` (Hyyrö's formulation of Myers' algorithm)."""
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+    match_masks: Dict[str, int] = {}
+    for i, symbol in enumerate(a):
+        match_masks[symbol] = match_masks.get(symbol, 0) | (1 << i)
+
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    positive, negative = mask, 0
+    distance = len(a)
+    for symbol in b:
+        matches = match_masks.get(symbol, 0)
+        vertical = matches | negative
+        horizontal = ((((matches & positive) + positive) ^ positive) | matches) & mask
+        h_positive = (negative | ~(horizontal | positive)) & mask
+        h_negative = positive & horizontal
+        if h_positive & last:
+            distance += 1
+        elif h_negative & last:
+            distance -= 1
+        h_positive = ((h_positive << 1) | 1) & mask
+        h_negative = (h_negative << 1) & mask
+        positive = (h_negative | ~(vertical | h_positive)) & mask
+        negative = h_positive & vertical
+    return distance
+
+
+@lru_cache(maxsize=8192)
+def levenshtein_distance(a: str, b: str) -> int:
+    """Unit-cost edit distance (insertions, deletions, substitutions)."""
+    if _rf_levenshtein is not None:
+        return _rf_levenshtein.distance(a, b)
+    # The shorter string becomes the bit vector
+    return _bitparallel_distance(a, b) if len(a) <= len(b) else _bitparallel_distance(b, a)
+
+
+def normalized_similarity(a: str, b: str) -> float:
+    """1.0 for identical strings down to 0.0 when no character survives; two empty strings are identical."""
+    longest = max(len(a), len(b))
+    if longest == 0:
+        return 1.0
+    return 1.0 - levenshtein_distance(a, b) / longest
+
+
+def similarity_batch(references: Sequence[str], hypotheses: Sequence[str], workers: int = -1) -> np.ndarray:
+    """Element-wise ``normalized_similarity`` of two equally long sequences as a float array.
+
+    ``workers`` is the rapidfuzz thread count (-1 = all cores); the pure-Python
+    fallback runs in the calling thread.
+    """
+    if len(references) != len(hypotheses):
+        raise ValueError(f"Got {len(references)} references but {len(hypotheses)} hypotheses")
+    if not references:
+        return np.zeros(0, dtype=np.float64)
+    if _rf_cpdist is not None:
+        return np.asarray(_rf_cpdist(references, hypotheses, scorer=_rf_levenshtein.normalized_similarity,
+                                     dtype=np.float64, workers=workers), dtype=np.float64)
+    return np.fromiter((normalized_similarity(a, b) for a, b in zip(references, hypotheses)),
+                       dtype=np.float64, count=len(references))
+
+
+def cache_stats() -> Dict[str, Any]:
+    info = levenshtein_distance.cache_info()
+    return {"backend": SIMILARITY_BACKEND, "size": info.currsize, "hits": info.hits, "misses": info.misses}